@@ -0,0 +1,213 @@
+"""
+City Views Finder - Parallel Page Fetch
+=======================================
+
+Function tool that fetches a list of candidate URLs (usually taken from the
+search step) concurrently and returns a short extract of every page in one
+result. Fetches run on a bounded number of workers, each with its own
+timeout, so the call takes about as long as the slowest page instead of the
+sum of all of them. A page that fails or times out is reported in the
+result without failing the others.
+"""
+
+import asyncio
+import http.client
+import ipaddress
+import os
+import socket
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "6"))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "8"))
+FETCH_MAX_URLS = int(os.getenv("FETCH_MAX_URLS", "10"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_SUMMARY_CHARS = int(os.getenv("FETCH_SUMMARY_CHARS", "1500"))
+# URLs come from web search results: loopback, private and link-local hosts are
+# refused unless explicitly allowed (e.g. for a local test server)
+FETCH_ALLOW_PRIVATE_HOSTS = os.getenv("FETCH_ALLOW_PRIVATE_HOSTS", "false").lower() in ("1", "true", "yes")
+
+MAX_REDIRECTS = 5
+READ_CHUNK_BYTES = 64 * 1024
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+USER_AGENT = "Mozilla/5.0 (compatible; CityViewsFinder/1.0)"
+
+# ============================================================================
+# PAGE EXTRACTION
+# ============================================================================
+
+class PageExtractor(HTMLParser):
+    """Collect the title, meta description, headings and visible text of a page"""
+
+    SKIPPED_TAGS = {"script", "style", "noscript", "svg", "nav", "footer", "header", "form"}
+    HEADING_TAGS = {"h1", "h2", "h3"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.headings = []
+        self.text = []
+        self._skip_depth = 0
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "meta":
+            attrs = dict(attrs)
+            if (attrs.get("name") or attrs.get("property") or "").lower() in ("description", "og:description"):
+                self.description = self.description or (attrs.get("content") or "").strip()
+        elif tag == "title" or tag in self.HEADING_TAGS:
+            self._current = tag
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == self._current:
+            self._current = None
+
+    def handle_data(self, data):
+        data = " ".join(data.split())
+        if not data or self._skip_depth:
+            return
+        if self._current == "title":
+            self.title = self.title or data
+        elif self._current in self.HEADING_TAGS:
+            self.headings.append(data)
+            self.text.append(data)
+        else:
+            self.text.append(data)
+
+def summarize_page(html: str, max_chars: int = FETCH_SUMMARY_CHARS) -> dict:
+    """Extractive summary of an HTML page: title, description, headings and leading text"""
+    extractor = PageExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return {
+        "title": extractor.title,
+        "description": extractor.description,
+        "headings": extractor.headings[:15],
+        "excerpt": " ".join(extractor.text)[:max_chars],
+    }
+
+# ============================================================================
+# FETCHING
+# ============================================================================
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError
+    return remaining
+
+def _check_host(host: str):
+    """Refuse hosts that resolve to non-public addresses"""
+    if FETCH_ALLOW_PRIVATE_HOSTS:
+        return
+    for *_, sockaddr in socket.getaddrinfo(host, None):
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not address.is_global:
+            raise PermissionError(f"{host} resolves to a non-public address ({address})")
+
+def _download(url: str, timeout: float) -> tuple:
+    # Everything, redirects and every read included, has to finish before the
+    # deadline: the socket timeout is shortened to the time left before each
+    # read, so the worker thread is really free when the call returns
+    deadline = time.monotonic() + timeout
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("Only http and https URLs are supported")
+        _check_host(parts.hostname)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=_remaining(deadline))
+        try:
+            # Kept aside: the connection drops its reference when the server
+            # closes after the response, while the response keeps reading from it
+            connection.connect()
+            sock = connection.sock
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            connection.request("GET", target, headers={"User-Agent": USER_AGENT, "Accept": "text/html,*/*;q=0.5"})
+            response = connection.getresponse()
+            location = response.getheader("Location")
+            if response.status in REDIRECT_STATUSES and location:
+                # Each hop is checked again, so a redirect can't reach a private host
+                url = urljoin(url, location)
+                continue
+            if response.status >= 400:
+                raise ValueError(f"HTTP Error {response.status}: {response.reason}")
+
+            body = bytearray()
+            while len(body) < FETCH_MAX_BYTES:
+                sock.settimeout(_remaining(deadline))
+                chunk = response.read1(min(READ_CHUNK_BYTES, FETCH_MAX_BYTES - len(body)))
+                if not chunk:
+                    break
+                body += chunk
+            charset = response.headers.get_content_charset() or "utf-8"
+            try:
+                html = body.decode(charset, errors="replace")
+            except LookupError:
+                html = body.decode("utf-8", errors="replace")
+            return response.status, url, html
+        finally:
+            connection.close()
+    raise ValueError(f"More than {MAX_REDIRECTS} redirects")
+
+async def _fetch_one(url: str, semaphore: asyncio.Semaphore, timeout: float) -> dict:
+    # The worker slot is held until the download thread has returned
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            status, final_url, html = await asyncio.to_thread(_download, url, timeout)
+            page = await asyncio.to_thread(summarize_page, html)
+        except (TimeoutError, socket.timeout):
+            return {"url": url, "ok": False, "error": f"Timed out after {timeout:g}s"}
+        except Exception as e:
+            return {"url": url, "ok": False, "error": str(e)}
+        return {
+            "url": url,
+            "final_url": final_url,
+            "ok": True,
+            "status": status,
+            "elapsed_seconds": round(time.perf_counter() - start, 2),
+            **page,
+        }
+
+async def fetch_pages(urls: list[str]) -> dict:
+    """Fetch several web pages in parallel and return a short extract of each one.
+
+    Use this to check the candidate pages found by the search step (viewpoints,
+    routes, paradores) in a single call instead of fetching them one by one.
+
+    Args:
+        urls: The page URLs to fetch, at most 10.
+
+    Returns:
+        A dict with one entry per URL in the same order as given, holding the
+        page title, description, headings and an excerpt of its text, or an
+        error message when the page could not be fetched.
+    """
+    start = time.perf_counter()
+    unique_urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+    skipped = unique_urls[FETCH_MAX_URLS:]
+    semaphore = asyncio.Semaphore(FETCH_WORKERS)
+    pages = await asyncio.gather(
+        *(_fetch_one(url, semaphore, FETCH_TIMEOUT_SECONDS) for url in unique_urls[:FETCH_MAX_URLS])
+    )
+    result = {
+        "pages": pages,
+        "fetched": sum(page["ok"] for page in pages),
+        "failed": sum(not page["ok"] for page in pages),
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }
+    if skipped:
+        result["skipped_urls"] = skipped
+    return result
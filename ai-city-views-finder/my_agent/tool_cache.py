@@ -0,0 +1,167 @@
+"""
+City Views Finder - Sub-agent Result Cache
+==========================================
+
+Caches the results of AgentTool invocations (the Google Search and URL
+context sub-agents) on disk, keyed by sub-agent name plus normalized request.
+A hit returns the stored answer without running the nested Gemini call.
+Entries expire after a TTL and the least recently used ones are evicted
+beyond a size limit.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import unicodedata
+from contextlib import contextmanager
+
+from google.adk.tools import agent_tool
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TOOL_CACHE_PATH = os.getenv(
+    "TOOL_CACHE_PATH", os.path.join(tempfile.gettempdir(), "city_views_tool_cache.sqlite3")
+)
+TOOL_CACHE_TTL_SECONDS = int(os.getenv("TOOL_CACHE_TTL_SECONDS", str(3 * 24 * 3600)))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2000"))
+
+# ============================================================================
+# DISK CACHE
+# ============================================================================
+
+# URLs anywhere in the text, also inside quotes, brackets or Markdown links.
+# Trailing punctuation stays with the URL: kept verbatim, it can only make
+# keys more specific
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+
+def normalize_request(text: str) -> str:
+    """'  Best viewpoints in  MÁLAGA ' and 'best viewpoints in málaga' share a key.
+
+    URLs keep their case, since paths are case-sensitive: /Mirador and
+    /mirador can be different pages.
+    """
+    text = " ".join(unicodedata.normalize("NFKC", text).split())
+    parts = []
+    position = 0
+    for match in URL_PATTERN.finditer(text):
+        parts.append(text[position:match.start()].casefold())
+        parts.append(match.group())
+        position = match.end()
+    parts.append(text[position:].casefold())
+    return "".join(parts)
+
+class ToolResultCache:
+    """SQLite store of sub-agent results with TTL and LRU eviction"""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS tool_results (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    elapsed_seconds REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS tool_results_lru ON tool_results (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str):
+        """Return (result, elapsed_seconds of the original call) or None"""
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT result, elapsed_seconds, created_at FROM tool_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    connection.execute("DELETE FROM tool_results WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE tool_results SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, result, elapsed_seconds: float):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tool_results (key, result, elapsed_seconds, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), elapsed_seconds, now, now),
+            )
+            connection.execute("DELETE FROM tool_results WHERE created_at < ?", (now - self.ttl_seconds,))
+            connection.execute(
+                "DELETE FROM tool_results WHERE key IN ("
+                "SELECT key FROM tool_results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 1),
+        }
+
+tool_result_cache = ToolResultCache(TOOL_CACHE_PATH, TOOL_CACHE_TTL_SECONDS, TOOL_CACHE_MAX_ENTRIES)
+
+# ============================================================================
+# CACHED AGENT TOOL
+# ============================================================================
+
+class CachedAgentTool(agent_tool.AgentTool):
+    """AgentTool that answers repeated requests from the disk cache"""
+
+    def __init__(self, agent, cache: ToolResultCache = tool_result_cache, **kwargs):
+        super().__init__(agent=agent, **kwargs)
+        self.cache = cache
+
+    async def run_async(self, *, args, tool_context):
+        request = {name: normalize_request(value) if isinstance(value, str) else value for name, value in args.items()}
+        key = f"{self.agent.name}|{json.dumps(request, sort_keys=True, ensure_ascii=False)}"
+        start = time.perf_counter()
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            result, original_seconds = cached
+            self.cache.hits += 1
+            self.cache.saved_seconds += max(original_seconds - (time.perf_counter() - start), 0.0)
+            logger.info(json.dumps({"event": "tool_cache_hit", "agent": self.agent.name, **self.cache.stats()}))
+            return result
+
+        self.cache.misses += 1
+        result = await super().run_async(args=args, tool_context=tool_context)
+        elapsed = time.perf_counter() - start
+        # Empty answers are usually failures; let the next call retry them
+        if result:
+            await asyncio.to_thread(self.cache.put, key, result, elapsed)
+        logger.info(json.dumps({
+            "event": "tool_cache_miss", "agent": self.agent.name, "elapsed_seconds": round(elapsed, 2),
+            **self.cache.stats(),
+        }))
+        return result
@@ -11,14 +11,16 @@ Date: 2026-01-11
 
 import streamlit as st
 import asyncio
+import threading
 import os
 import vertexai
 from vertexai import agent_engines
 from pathlib import Path
 import logging
+import time
 from datetime import datetime
 from google.cloud import logging as cloud_logging
-import json
+from telemetry import TelemetryShipper, make_sink
 
 # ============================================================================
 # CONFIGURATION
@@ -34,6 +36,11 @@ if not AGENT_RESOURCE_NAME:
     if resource_file.exists():
         AGENT_RESOURCE_NAME = resource_file.read_text().strip()
 
+# Streaming render rate: repaint at most every RENDER_INTERVAL_MS, or sooner
+# once RENDER_MIN_CHARS new characters are waiting
+RENDER_INTERVAL_SECONDS = int(os.getenv("RENDER_INTERVAL_MS", "80")) / 1000
+RENDER_MIN_CHARS = int(os.getenv("RENDER_MIN_CHARS", "400"))
+
 # ============================================================================
 # LOGGING & MONITORING SETUP
 # ============================================================================
@@ -56,6 +63,14 @@ def setup_cloud_logging():
 
 logger = setup_cloud_logging()
 
+@st.cache_resource
+def get_telemetry():
+    """Start the batched telemetry shipper once per process (cached)"""
+    return TelemetryShipper(make_sink(PROJECT_ID))
+
+# Monitoring events go through the shipper so they never block a chat turn
+telemetry = get_telemetry()
+
 # ============================================================================
 # MONITORING FUNCTIONS
 # ============================================================================
@@ -73,7 +88,7 @@ def log_user_interaction(user_id: str, message: str, response_time: float = None
     if response_time:
         log_data["response_time_seconds"] = response_time
 
-    logger.info(json.dumps(log_data))
+    telemetry.emit(log_data)
 
 def log_agent_response(user_id: str, session_id: str, message: str, response_length: int, response_time: float):
     """Log agent responses for monitoring"""
@@ -88,7 +103,20 @@ def log_agent_response(user_id: str, session_id: str, message: str, response_len
         "project_id": PROJECT_ID,
     }
 
-    logger.info(json.dumps(log_data))
+    telemetry.emit(log_data)
+
+def log_render_stats(user_id: str, session_id: str, stats: dict):
+    """Log streaming render statistics for monitoring"""
+    log_data = {
+        "event": "render_stats",
+        "user_id": user_id,
+        "session_id": session_id,
+        **stats,
+        "timestamp": datetime.utcnow().isoformat(),
+        "project_id": PROJECT_ID,
+    }
+
+    telemetry.emit(log_data)
 
 def log_error(error_type: str, error_message: str, user_id: str = None):
     """Log errors for monitoring"""
@@ -103,7 +131,7 @@ def log_error(error_type: str, error_message: str, user_id: str = None):
     if user_id:
         log_data["user_id"] = user_id
 
-    logger.error(json.dumps(log_data))
+    telemetry.emit(log_data, priority=True)
 
 # ============================================================================
 # STREAMLIT UI CONFIGURATION
@@ -190,6 +218,101 @@ def initialize_agent():
         logger.error(error_msg)
         return None
 
+# ============================================================================
+# BACKGROUND EVENT LOOP
+# ============================================================================
+
+@st.cache_resource
+def get_event_loop():
+    """Start one event loop in a daemon thread, shared by every rerun and user.
+
+    All calls to Agent Engine run on this loop, so the async client and its
+    HTTP connections live as long as the app instead of one throwaway loop
+    per message.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+    logger.info("Background event loop started")
+    return loop
+
+def run_in_loop(coro):
+    """Run a coroutine on the background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+def iterate_in_loop(async_gen):
+    """Iterate an async generator on the background loop from the script thread.
+
+    Chunks are yielded here, so Streamlit elements are still updated from the
+    script thread that owns them.
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_gen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Also reached when Streamlit interrupts the script mid-stream
+        asyncio.run_coroutine_threadsafe(async_gen.aclose(), loop)
+
+# ============================================================================
+# STREAMING RENDERER
+# ============================================================================
+
+class ThrottledRenderer:
+    """Buffer streamed chunks and repaint a placeholder at a bounded rate.
+
+    Chunks are appended to a list and only joined when a repaint is due,
+    instead of copying the whole answer and re-rendering its Markdown on
+    every token.
+    """
+
+    def __init__(self, placeholder, interval: float = RENDER_INTERVAL_SECONDS, min_chars: int = RENDER_MIN_CHARS):
+        self.placeholder = placeholder
+        self.interval = interval
+        self.min_chars = min_chars
+        self.chunks = []
+        self.chunk_count = 0
+        self.pending_chars = 0
+        self.repaints = 0
+        self.render_seconds = 0.0
+        self.started = time.perf_counter()
+        self.last_repaint = self.started
+
+    def add(self, chunk: str):
+        self.chunks.append(chunk)
+        self.chunk_count += 1
+        self.pending_chars += len(chunk)
+        now = time.perf_counter()
+        if now - self.last_repaint >= self.interval or self.pending_chars >= self.min_chars:
+            self._repaint(cursor=True)
+
+    def finish(self) -> str:
+        """Final flush without the cursor; returns the whole text"""
+        return self._repaint(cursor=False)
+
+    def _repaint(self, cursor: bool) -> str:
+        text = "".join(self.chunks)
+        self.chunks = [text]
+        start = time.perf_counter()
+        self.placeholder.markdown(text + "▌" if cursor else text)
+        self.last_repaint = time.perf_counter()
+        self.render_seconds += self.last_repaint - start
+        self.repaints += 1
+        self.pending_chars = 0
+        return text
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "chunks": self.chunk_count,
+            "chunks_per_second": round(self.chunk_count / elapsed, 1) if elapsed else 0.0,
+            "repaints": self.repaints,
+            "render_time_seconds": round(self.render_seconds, 3),
+            "stream_time_seconds": round(elapsed, 3),
+        }
+
 # ============================================================================
 # AGENT INTERACTION FUNCTIONS
 # ============================================================================
@@ -211,7 +334,7 @@ async def create_session(remote_app, user_id: str):
 async def query_agent(remote_app, user_id: str, session_id: str, message: str):
     """Query the agent and stream the response"""
     start_time = datetime.now()
-    response_text = ""
+    response_length = 0
 
     try:
         log_user_interaction(user_id, message)
@@ -230,28 +353,28 @@ async def query_agent(remote_app, user_id: str, session_id: str, message: str):
                         for part in content['parts']:
                             if 'text' in part and part['text']:
                                 text = part['text']
-                                response_text += text
+                                response_length += len(text)
                                 yield text
             # Handle object events (fallback for other event types)
             elif hasattr(event, 'text') and event.text:
                 text = event.text
-                response_text += text
+                response_length += len(text)
                 yield text
             elif hasattr(event, 'content'):
                 if hasattr(event.content, 'parts'):
                     for part in event.content.parts:
                         if hasattr(part, 'text') and part.text:
                             text = part.text
-                            response_text += text
+                            response_length += len(text)
                             yield text
                 elif hasattr(event.content, 'text') and event.content.text:
                     text = event.content.text
-                    response_text += text
+                    response_length += len(text)
                     yield text
 
         # Log the complete response
         response_time = (datetime.now() - start_time).total_seconds()
-        log_agent_response(user_id, session_id, message, len(response_text), response_time)
+        log_agent_response(user_id, session_id, message, response_length, response_time)
 
     except Exception as e:
         error_msg = f"Error querying agent: {e}"
@@ -298,6 +421,7 @@ def main():
             st.info(f"Session: {st.session_state.session_id[:8]}...")
 
         st.caption(f"User ID: {st.session_state.user_id}")
+        st.caption(f"Telemetry queue: {telemetry.stats()['queue_depth']} events")
 
         st.divider()
 
@@ -321,12 +445,7 @@ def main():
     # Create session if not exists
     if st.session_state.session_id is None:
         try:
-            import nest_asyncio
-            nest_asyncio.apply()
-
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            st.session_state.session_id = loop.run_until_complete(
+            st.session_state.session_id = run_in_loop(
                 create_session(st.session_state.remote_app, st.session_state.user_id)
             )
         except Exception as e:
@@ -351,30 +470,20 @@ def main():
         # Get agent response
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
+            renderer = ThrottledRenderer(message_placeholder)
             full_response = ""
 
             try:
-                # Collect response using event loop
-                import nest_asyncio
-                nest_asyncio.apply()
-
-                async def collect_response():
-                    response = ""
-                    async for chunk in query_agent(
-                        st.session_state.remote_app,
-                        st.session_state.user_id,
-                        st.session_state.session_id,
-                        prompt
-                    ):
-                        response += chunk
-                        # Update display in real-time
-                        message_placeholder.markdown(response + "▌")
-                    return response
-
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                full_response = loop.run_until_complete(collect_response())
-                message_placeholder.markdown(full_response)
+                # The query runs on the background loop; chunks come back here
+                for chunk in iterate_in_loop(query_agent(
+                    st.session_state.remote_app,
+                    st.session_state.user_id,
+                    st.session_state.session_id,
+                    prompt
+                )):
+                    renderer.add(chunk)
+                full_response = renderer.finish()
+                log_render_stats(st.session_state.user_id, st.session_state.session_id, renderer.stats())
 
             except Exception as e:
                 error_msg = f"❌ Error: {e}"
@@ -0,0 +1,159 @@
+"""
+City Views Finder - Telemetry Shipper
+=====================================
+
+Non-blocking pipeline for the monitoring events of the Streamlit frontend.
+
+Events are put on a bounded in-memory queue and a background thread ships
+them in batches, by size or by time, to a sink: Cloud Logging, or a local
+JSON-lines file / stdout stand-in. Emitting an event never waits on the
+network; under backpressure low-priority events are sampled out and, when
+the queue is full, dropped.
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TELEMETRY_SINK = os.getenv("TELEMETRY_SINK", "cloud")                 # "cloud", "stdout" or a file path
+TELEMETRY_QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "100"))
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "2.0"))
+TELEMETRY_HIGH_WATER = float(os.getenv("TELEMETRY_HIGH_WATER", "0.8"))    # Fill ratio where sampling starts
+TELEMETRY_SAMPLE_RATE = float(os.getenv("TELEMETRY_SAMPLE_RATE", "0.1"))  # Share of events kept above it
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+class StreamSink:
+    """Write events as JSON lines to a file, or to stdout when no path is given"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+
+    def write(self, events: list):
+        lines = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        else:
+            sys.stdout.write(lines)
+            sys.stdout.flush()
+
+class CloudLoggingSink:
+    """Write events to Cloud Logging, one API call per batch"""
+
+    def __init__(self, project_id: str, log_name: str = "city-views-finder"):
+        from google.cloud import logging as cloud_logging
+        self.logger = cloud_logging.Client(project=project_id).logger(log_name)
+
+    def write(self, events: list):
+        batch = self.logger.batch()
+        for event in events:
+            severity = "ERROR" if event.get("event") == "error" else "INFO"
+            batch.log_struct(event, severity=severity)
+        batch.commit()
+
+def make_sink(project_id: str, sink: str = TELEMETRY_SINK):
+    """Build the configured sink, falling back to stdout without Cloud Logging"""
+    if sink == "stdout":
+        return StreamSink()
+    if sink != "cloud":
+        return StreamSink(sink)
+    try:
+        return CloudLoggingSink(project_id)
+    except Exception as e:
+        print(f"Cloud Logging not available for telemetry, using stdout: {e}", file=sys.stderr)
+        return StreamSink()
+
+# ============================================================================
+# SHIPPER
+# ============================================================================
+
+class TelemetryShipper:
+    """Bounded queue plus a background thread that ships events in batches"""
+
+    def __init__(
+        self,
+        sink,
+        max_queue: int = TELEMETRY_QUEUE_SIZE,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_seconds: float = TELEMETRY_FLUSH_SECONDS,
+        high_water: float = TELEMETRY_HIGH_WATER,
+        sample_rate: float = TELEMETRY_SAMPLE_RATE,
+    ):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.high_water_depth = int(max_queue * high_water)
+        self.sample_rate = sample_rate
+        self.counters = {"emitted": 0, "shipped": 0, "sampled_out": 0, "dropped": 0, "failed_batches": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telemetry-shipper", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, event: dict, priority: bool = False):
+        """Queue an event without blocking. Priority events (errors) are never sampled out"""
+        if not priority and self.queue.qsize() >= self.high_water_depth and random.random() >= self.sample_rate:
+            self.counters["sampled_out"] += 1
+            return
+        try:
+            self.queue.put_nowait(event)
+            self.counters["emitted"] += 1
+        except queue.Full:
+            self.counters["dropped"] += 1
+
+    def stats(self) -> dict:
+        return {"queue_depth": self.queue.qsize(), **self.counters}
+
+    def close(self, timeout: float = 5.0):
+        """Stop the thread after shipping what is still queued"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._ship(self._next_batch())
+        # Final drain on shutdown
+        while not self.queue.empty():
+            self._ship(self._next_batch(wait=False))
+
+    def _next_batch(self, wait: bool = True) -> list:
+        # Block for the first event, then take more until the batch is full
+        # or flush_seconds have passed since the first one
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_seconds if deadline is None else deadline - time.monotonic()
+            if not wait or timeout <= 0:
+                timeout = 0
+            try:
+                batch.append(self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_seconds
+        return batch
+
+    def _ship(self, batch: list):
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+            self.counters["shipped"] += len(batch)
+        except Exception as e:
+            # Telemetry must never take the app down; the batch is lost
+            self.counters["failed_batches"] += 1
+            print(f"Telemetry batch of {len(batch)} events failed: {e}", file=sys.stderr)
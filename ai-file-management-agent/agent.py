@@ -1,9 +1,99 @@
 import os
 import json
+import mmap
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from file_cache import file_cache
+from search_index import SearchIndex
+from history import HistoryManager, DEFAULT_TOKEN_BUDGET
+
+# NUMERO MAXIMO DE HERRAMIENTAS EJECUTANDOSE A LA VEZ
+MAX_TOOL_WORKERS = 4
+
+# LIMITES DE LISTADO
+DEFAULT_LIST_LIMIT = 200            # Entradas por página de list_files_in_dir
+MAX_LIST_LIMIT = 1000
+
+# LIMITES DE BÚSQUEDA
+DEFAULT_SEARCH_RESULTS = 50
+MAX_SEARCH_RESULTS = 500
+
+# LIMITES DE LECTURA
+MAX_READ_BYTES = 64 * 1024          # Tope duro de bytes devueltos por read_file
+MMAP_THRESHOLD = 1024 * 1024        # A partir de este tamaño se lee con mmap
+SCAN_CHUNK = 1024 * 1024            # Bloque para contar líneas sin copiar el archivo
+
+# ESCRITURAS POR RUTA: las llamadas en paralelo (y las sesiones del servicio,
+# que comparten el pool) editan un mismo archivo de una en una
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(real_path):
+    with _path_locks_guard:
+        return _path_locks.setdefault(real_path, threading.Lock())
+
+
+def _count_lines(buffer, size):
+    # Cuenta líneas por bloques para no duplicar en memoria archivos grandes
+    lines = 0
+    for start in range(0, size, SCAN_CHUNK):
+        lines += buffer[start:start + SCAN_CHUNK].count(b'\n')
+    if size and buffer[size - 1:size] != b'\n':
+        lines += 1
+    return lines
+
+
+def _line_offset(buffer, size, line):
+    # Devuelve el byte donde empieza la línea `line` (0 = primera línea)
+    if line <= 0:
+        return 0
+    seen = 0
+    for start in range(0, size, SCAN_CHUNK):
+        chunk = buffer[start:start + SCAN_CHUNK]
+        found = chunk.count(b'\n')
+        if seen + found < line:
+            seen += found
+            continue
+        position = -1
+        while seen < line:
+            position = chunk.find(b'\n', position + 1)
+            seen += 1
+        return start + position + 1
+    return size
+
+
+def _tail_offset(buffer, size, lines):
+    # Devuelve el byte donde empiezan las últimas `lines` líneas
+    end = size - 1 if size and buffer[size - 1:size] == b'\n' else size
+    position = end
+    for _ in range(lines):
+        position = buffer.rfind(b'\n', 0, position)
+        if position == -1:
+            return 0
+    return position + 1
 
 class Agent:
-    def __init__(self):
+    def __init__(self, max_workers=MAX_TOOL_WORKERS, token_budget=DEFAULT_TOKEN_BUDGET, server_state=False,
+                 root_dir=None, executor=None):
         self.setup_tools()
+        # SANDBOX: si hay root_dir, las herramientas no pueden salir de él
+        self.root_dir = os.path.realpath(root_dir) if root_dir else None
+        self.history = HistoryManager(token_budget=token_budget)
+        # MODO ESTADO EN SERVIDOR: se encadenan turnos con previous_response_id
+        # y solo se envían los elementos nuevos (pending_input)
+        self.server_state = server_state
+        self.previous_response_id = None
+        self.pending_input = []
+        self.turn_timings = []
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers)
+        self.search_indexes = {}
+        self.search_lock = threading.Lock()
         self.messages = [
     {"role": "system", "content": "Eres un asistente útil que habla español, eres muy amable y conciso en tus respuestas."},
 ]
@@ -14,13 +104,47 @@ class Agent:
             {
                 "type": "function",
                 "name": "list_files_in_dir",
-                "description": "Lista los archivos que existen en un directorio dado (por defecto es el directorio actual)",
+                "description": "Lista los archivos de un directorio (por defecto el actual) usando paginación. Cada entrada es [ruta, tipo (f=archivo, d=directorio, l=enlace), tamaño en bytes, mtime en segundos]. Si hay más resultados se devuelve next_cursor.",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "directory": {
                             "type": "string",
                             "description": "Directorio para listar (opcional). Por defecto es el directorio actual"
+                        },
+                        "recursive": {
+                            "type": "boolean",
+                            "description": "Si es true, incluye también los subdirectorios"
+                        },
+                        "max_depth": {
+                            "type": "integer",
+                            "description": "Profundidad máxima de subdirectorios cuando recursive es true (opcional)"
+                        },
+                        "pattern": {
+                            "type": "string",
+                            "description": "Patrón glob sobre el nombre, por ejemplo '*.py' (opcional)"
+                        },
+                        "extensions": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Extensiones a incluir, por ejemplo ['.py', '.md'] (opcional)"
+                        },
+                        "sort_by": {
+                            "type": "string",
+                            "enum": ["name", "size", "mtime"],
+                            "description": "Campo de ordenación. Por defecto 'name'"
+                        },
+                        "descending": {
+                            "type": "boolean",
+                            "description": "Orden descendente"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "Valor next_cursor de la página anterior (opcional)"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": f"Entradas por página (por defecto {DEFAULT_LIST_LIMIT}, máximo {MAX_LIST_LIMIT})"
                         }
                     },
                     "required": []
@@ -29,13 +153,35 @@ class Agent:
             {
                 "type": "function",
                 "name": "read_file",
-                "description": "Lee el contenido de un archivo en una ruta especificada",
+                "description": "Lee una ventana de un archivo (por líneas o bytes). Devuelve también el tamaño total y el número de líneas para poder paginar sin releer el archivo completo.",
                 "parameters": {
                     "type": "object",
                     "properties": {
                         "path": {
                             "type": "string",
                             "description": "La ruta del archivo a leer"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "Primera línea (o byte) a leer, empezando en 0. Por defecto 0"
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Número máximo de líneas (o bytes) a leer (opcional)"
+                        },
+                        "unit": {
+                            "type": "string",
+                            "enum": ["lines", "bytes"],
+                            "description": "Unidad de offset y limit. Por defecto 'lines'"
+                        },
+                        "mode": {
+                            "type": "string",
+                            "enum": ["head", "tail"],
+                            "description": "'head' lee desde el principio, 'tail' lee las últimas `limit` líneas o bytes (opcional)"
+                        },
+                        "max_bytes": {
+                            "type": "integer",
+                            "description": f"Tope de bytes devueltos (máximo {MAX_READ_BYTES})"
                         }
                     },
                     "required": ["path"]
@@ -44,7 +190,7 @@ class Agent:
             {
                 "type": "function",
                 "name": "edit_file",
-                "description": "Edita el contenido de un archivo reemplazando previous_text por new_text. Crea el archivo si no existe.",
+                "description": "Edita un archivo aplicando uno o varios cambios (previous_text -> new_text) de forma atómica: si algún cambio no coincide, aparece varias veces o se solapa con otro, no se aplica ninguno. Sin previous_text ni edits crea o sobrescribe el archivo con new_text; con edits, new_text se ignora.",
                 "parameters": {
                     "type": "object",
                     "properties": {
@@ -59,105 +205,578 @@ class Agent:
                         "new_text": {
                             "type": "string",
                             "description": "El texto que reemplazará a previous_text (o el texto para un archivo nuevo)"
+                        },
+                        "replace_all": {
+                            "type": "boolean",
+                            "description": "Reemplaza todas las apariciones de previous_text en lugar de exigir una única coincidencia"
+                        },
+                        "edits": {
+                            "type": "array",
+                            "description": "Lista de cambios a aplicar en una sola llamada",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "previous_text": {"type": "string"},
+                                    "new_text": {"type": "string"},
+                                    "replace_all": {"type": "boolean"}
+                                },
+                                "required": ["previous_text", "new_text"]
+                            }
                         }
                     },
                     "required": ["path", "new_text"]
                 }
+            },
+            {
+                "type": "function",
+                "name": "search_files",
+                "description": "Busca un texto (sin distinguir mayúsculas) en todos los archivos de un directorio usando un índice. Devuelve coincidencias 'ruta:línea:fragmento' sin tener que leer los archivos completos.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Texto a buscar, por ejemplo 'def process_response'"
+                        },
+                        "directory": {
+                            "type": "string",
+                            "description": "Directorio raíz de la búsqueda (opcional). Por defecto es el directorio actual"
+                        },
+                        "max_results": {
+                            "type": "integer",
+                            "description": f"Número máximo de coincidencias (por defecto {DEFAULT_SEARCH_RESULTS}, máximo {MAX_SEARCH_RESULTS})"
+                        }
+                    },
+                    "required": ["query"]
+                }
             }
         ]
         
+    def _resolve(self, path):
+        # Ruta real de `path`; con sandbox se interpreta relativa a root_dir
+        if self.root_dir is None:
+            return os.path.realpath(path)
+        real_path = os.path.realpath(os.path.join(self.root_dir, path))
+        if real_path != self.root_dir and not real_path.startswith(self.root_dir + os.sep):
+            raise PermissionError(f"{path} está fuera del directorio permitido")
+        return real_path
+    
+    
 # DEFINICION DE LAS TOOLS (FUNCIONES)
 # TOOL: LISTAR ARCHIVOS EN DIRECTORIO
-    def list_files_in_dir(self, directory="."):
+    def list_files_in_dir(self, directory=".", recursive=False, max_depth=None, pattern=None,
+                          extensions=None, sort_by="name", descending=False, cursor=None,
+                          limit=DEFAULT_LIST_LIMIT):
         print('📞 Herramienta llamada: list_files_in_dir')
         try:
-            files = os.listdir(directory)
-            return {'files': files}
+            if sort_by not in ("name", "size", "mtime"):
+                return f"Orden desconocido: {sort_by} (usa 'name', 'size' o 'mtime')"
+            
+            entries = self._scan_dir(self._resolve(directory), recursive, max_depth)
+            
+            # FILTROS POR PATRÓN GLOB Y EXTENSIÓN
+            if pattern:
+                entries = [e for e in entries if fnmatch(os.path.basename(e[0]), pattern)]
+            if extensions:
+                suffixes = tuple((ext if ext.startswith('.') else f'.{ext}').lower() for ext in extensions)
+                entries = [e for e in entries if e[0].lower().endswith(suffixes)]
+                
+            column = {"name": 0, "size": 2, "mtime": 3}[sort_by]
+            entries.sort(key=lambda e: (e[column], e[0]), reverse=descending)
+            
+            # PAGINACIÓN: el cursor es la posición de la siguiente página
+            start = int(cursor or 0)
+            limit = max(1, min(limit or DEFAULT_LIST_LIMIT, MAX_LIST_LIMIT))
+            page = entries[start:start + limit]
+            next_cursor = str(start + limit) if start + limit < len(entries) else None
+            
+            return {
+                'directory': directory,
+                'fields': ['path', 'type', 'size', 'mtime'],
+                'entries': page,
+                'total': len(entries),
+                'next_cursor': next_cursor,
+            }
         except Exception as e:
             return f"Error al listar archivos: {str(e)}"
         
         
+    def _scan_dir(self, directory, recursive, max_depth):
+        entries = []
+        pending = [(directory, 0)]
+        while pending:
+            current, depth = pending.pop()
+            try:
+                children = self._dir_entries(current)
+            except OSError:
+                if current == directory:
+                    raise
+                continue
+            for name, kind, size, mtime in children:
+                child = os.path.join(current, name)
+                entries.append([os.path.relpath(child, directory), kind, size, mtime])
+                
+                if kind == 'd' and recursive and (max_depth is None or depth < max_depth):
+                    pending.append((child, depth + 1))
+        return entries
+    
+    
+    def _dir_entries(self, directory):
+        # Entradas de un único directorio. Solo los nombres y tipos se cachean
+        # por (ruta, tamaño, mtime_ns) del directorio: crear o borrar entradas
+        # cambia su mtime, pero reescribir un archivo no, así que tamaño y
+        # fecha se leen siempre con un stat nuevo por entrada
+        real_path = os.path.realpath(directory)
+        info = os.stat(real_path)
+        names = file_cache.get(real_path, info)
+        if names is None:
+            # Recorrido con os.scandir: el tipo sale del propio directorio
+            names = []
+            with os.scandir(real_path) as iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_symlink():
+                            kind = 'l'
+                        elif entry.is_dir(follow_symlinks=False):
+                            kind = 'd'
+                        else:
+                            kind = 'f'
+                    except OSError:
+                        continue
+                    names.append((entry.name, kind))
+            file_cache.put(real_path, info, names, sum(len(name) + 64 for name, _ in names))
+            
+        children = []
+        for name, kind in names:
+            try:
+                entry_info = os.stat(os.path.join(real_path, name), follow_symlinks=False)
+            except OSError:
+                continue
+            size = entry_info.st_size if kind == 'f' else 0
+            children.append((name, kind, size, int(entry_info.st_mtime)))
+        return children
+    
+    
 # TOOL: LEER ARCHIVOS
-    def read_file(self, path):
+    def read_file(self, path, offset=0, limit=None, unit="lines", mode=None, max_bytes=MAX_READ_BYTES):
         print('📞 Herramienta llamada: read_file')
         try:
-            with open(path, encoding='utf-8') as file:
-                return file.read()
+            max_bytes = min(max_bytes or MAX_READ_BYTES, MAX_READ_BYTES)
+            real_path = self._resolve(path)
+            
+            with self._file_buffer(real_path) as (buffer, total_lines):
+                return self._read_window(path, buffer, len(buffer), offset, limit, unit, mode, max_bytes, total_lines)
         except Exception as e:
             error_message = f"Error al leer archivo: {path}"
             print(error_message)
             return error_message
         
+        
+    def _read_window(self, path, buffer, size, offset, limit, unit, mode, max_bytes, total_lines):
+        offset = max(int(offset or 0), 0)
+        
+        if unit == "bytes":
+            if mode == "tail":
+                start = max(size - (limit or max_bytes), 0)
+            else:
+                start = 0 if mode == "head" else min(offset, size)
+            end = size if limit is None else min(start + limit, size)
+        elif unit == "lines":
+            if mode == "tail":
+                first_line = None
+                start = _tail_offset(buffer, size, limit or total_lines)
+                end = size
+            else:
+                first_line = 0 if mode == "head" else min(offset, total_lines)
+                start = _line_offset(buffer, size, first_line)
+                end = size if limit is None else _line_offset(buffer, size, first_line + limit)
+        else:
+            return f"Unidad desconocida: {unit} (usa 'lines' o 'bytes')"
+        
+        # TOPE DURO DE TAMAÑO: se corta la ventana y se avisa al modelo
+        # (en modo tail se conserva el final de la ventana)
+        truncated = end - start > max_bytes
+        if truncated and mode == "tail":
+            start = end - max_bytes
+            if unit == "lines":
+                newline = buffer.find(b'\n', start, end)
+                start = newline + 1 if newline != -1 else start
+        elif truncated:
+            cut = start + max_bytes
+            if unit == "lines":
+                newline = buffer.rfind(b'\n', start, cut)
+                cut = newline + 1 if newline != -1 else cut
+            end = cut
+            
+        window = buffer[start:end]
+        result = {
+            'path': path,
+            'content': window.decode('utf-8', errors='replace'),
+            'unit': unit,
+            'total_bytes': size,
+            'total_lines': total_lines,
+            'truncated': truncated,
+        }
+        if unit == "lines":
+            window_lines = window.count(b'\n') + (1 if window and not window.endswith(b'\n') else 0)
+            if mode == "tail":
+                first_line = total_lines - window_lines
+            result['start'] = first_line
+            result['end'] = first_line + window_lines
+        else:
+            result['start'] = start
+            result['end'] = end
+        return result
+    
+    
+    @contextmanager
+    def _file_buffer(self, real_path):
+        # Contenido del archivo como bytes (desde la caché o disco) o como mmap,
+        # junto con su número de líneas
+        cached = file_cache.get(real_path, os.stat(real_path))
+        if cached is not None and cached['data'] is not None:
+            # ACIERTO EN CACHÉ: no se vuelve a abrir ni a contar el archivo
+            yield cached['data'], cached['lines']
+            return
+        
+        with open(real_path, 'rb') as file:
+            info = os.fstat(file.fileno())
+            size = info.st_size
+            if size == 0:
+                buffer = b''
+            elif size >= MMAP_THRESHOLD:
+                # Archivos grandes: solo se tocan las páginas que se usan
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = file.read()
+            try:
+                if cached is None:
+                    # De los archivos grandes solo se cachea el número de líneas
+                    small = size < MMAP_THRESHOLD
+                    cached = {'data': buffer if small else None, 'lines': _count_lines(buffer, size)}
+                    file_cache.put(real_path, info, cached, size if small else 64)
+                yield buffer, cached['lines']
+            finally:
+                if isinstance(buffer, mmap.mmap):
+                    buffer.close()
+    
+    
+    def _invalidate(self, real_path):
+        # Las escrituras del agente invalidan el archivo y su directorio
+        file_cache.invalidate(real_path)
+        file_cache.invalidate(os.path.dirname(real_path))
+        
 # TOOL: EDITAR ARCHIVOS
-    def edit_file(self, path, new_text, previous_text):
+    def edit_file(self, path, new_text=None, previous_text="", edits=None, replace_all=False):
         print('📞 Herramienta llamada: edit_file')
         try:
-            existed = os.path.exists(path)
-            if existed and previous_text:
-                content = self.read_file(path)
-                
-                if previous_text not in content:
-                    return f"El texto {previous_text} no coincide con el contenido actual del archivo"
-                
-                content = content.replace(previous_text, new_text)
-                
-            else:
-                # Crear o sobrescribir con el nuevo texto directamente
-                dir_name = os.path.dirname(path)
-                if dir_name:
-                    os.makedirs(dir_name, exist_ok=True)
-                    
-                content = new_text
-                
-            with open(path, 'w', encoding='utf-8') as file:
-                file.write(content)
-                
-            action = "editado" if existed and previous_text else "creado"
-            return f"Archivo {path} {action} exitosamente" 
+            real_path = self._resolve(path)
+            # Leer-modificar-escribir con el lock de la ruta: dos ediciones del
+            # mismo archivo en una respuesta se aplican una tras otra
+            with _path_lock(real_path):
+                return self._edit_file(path, real_path, new_text, previous_text, edits, replace_all)
         except Exception as e:
             error_message = f"Error al editar archivo: {path}"
             print(error_message)
             return error_message                                    
         
         
+    def _edit_file(self, path, real_path, new_text, previous_text, edits, replace_all):
+        existed = os.path.exists(real_path)
+        if edits and not existed:
+            # Los cambios por bloques necesitan un archivo sobre el que aplicarse;
+            # solo la forma previous_text/new_text crea archivos nuevos
+            return f"No se aplicó ningún cambio: el archivo {path} no existe"
+        hunks = list(edits or [])
+        if previous_text:
+            hunks.insert(0, {'previous_text': previous_text, 'new_text': new_text, 'replace_all': replace_all})
+        if not hunks and (edits is not None or new_text is None):
+            # Sobrescribir exige un new_text explícito: una llamada sin cambios
+            # (o con edits vacío) no debe vaciar el archivo
+            return f"No se aplicó ningún cambio en {path}: indica edits, previous_text o new_text"
+            
+        if existed and hunks:
+            with self._file_buffer(real_path) as (buffer, _):
+                # Se respeta el salto de línea del archivo (\n o \r\n)
+                newline = '\r\n' if buffer.find(b'\r\n') != -1 else '\n'
+                spans, problems = self._locate_hunks(buffer, hunks, newline)
+                if problems:
+                    # Si algún cambio falla no se aplica ninguno
+                    return f"No se aplicó ningún cambio en {path}:\n" + "\n".join(problems)
+                temp_path = self._write_temp(real_path, buffer, spans)
+            # El reemplazo se hace con el archivo original ya cerrado
+            os.replace(temp_path, real_path)
+            self._invalidate(real_path)
+            return f"Archivo {path} editado exitosamente ({len(spans)} reemplazos)"
+        
+        # Crear o sobrescribir con el nuevo texto directamente
+        dir_name, name = os.path.split(real_path)
+        os.makedirs(dir_name, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=dir_name, prefix=f'.{name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(new_text)
+            if existed:
+                shutil.copymode(real_path, temp_path)
+            os.replace(temp_path, real_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self._invalidate(real_path)
+        
+        action = "sobrescrito" if existed else "creado"
+        return f"Archivo {path} {action} exitosamente" 
+        
+        
+    def _locate_hunks(self, buffer, hunks, newline):
+        # Localiza todos los cambios en una sola pasada por cambio sobre el
+        # buffer (bytes o mmap) sin cargar el archivo entero en memoria
+        spans = []
+        problems = []
+        for number, hunk in enumerate(hunks, 1):
+            old = (hunk.get('previous_text') or '').replace('\r\n', '\n')
+            new = (hunk.get('new_text') or '').replace('\r\n', '\n')
+            if not old:
+                problems.append(f"Cambio {number}: previous_text está vacío")
+                continue
+            old_bytes = old.replace('\n', newline).encode('utf-8')
+            new_bytes = new.replace('\n', newline).encode('utf-8')
+            
+            positions = []
+            position = buffer.find(old_bytes)
+            while position != -1:
+                positions.append(position)
+                if len(positions) > 1 and not hunk.get('replace_all'):
+                    break
+                position = buffer.find(old_bytes, position + len(old_bytes))
+                
+            if not positions:
+                problems.append(f"Cambio {number}: el texto {old!r} no coincide con el contenido actual del archivo")
+            elif len(positions) > 1 and not hunk.get('replace_all'):
+                problems.append(f"Cambio {number}: el texto {old!r} aparece varias veces; añade más contexto o usa replace_all")
+            else:
+                spans += [(start, start + len(old_bytes), new_bytes, number) for start in positions]
+                
+        spans.sort()
+        for previous, current in zip(spans, spans[1:]):
+            if current[0] < previous[1]:
+                problems.append(f"Los cambios {previous[3]} y {current[3]} se solapan")
+        return spans, problems
+    
+    
+    def _write_temp(self, real_path, buffer, spans):
+        # Escribe el resultado en un temporal del mismo directorio copiando el
+        # original por bloques; el llamador lo mueve encima con os.replace
+        directory, name = os.path.split(real_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                position = 0
+                for start, end, new_bytes, _ in spans + [(len(buffer), len(buffer), b'', None)]:
+                    for chunk in range(position, start, SCAN_CHUNK):
+                        file.write(buffer[chunk:min(chunk + SCAN_CHUNK, start)])
+                    file.write(new_bytes)
+                    position = end
+                file.flush()
+                os.fsync(file.fileno())
+            shutil.copymode(real_path, temp_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return temp_path
+        
+        
+# TOOL: BUSCAR EN ARCHIVOS
+    def search_files(self, query, directory=".", max_results=DEFAULT_SEARCH_RESULTS):
+        print('📞 Herramienta llamada: search_files')
+        try:
+            if not query:
+                return "La búsqueda no puede estar vacía"
+            root = self._resolve(directory)
+            if not os.path.isdir(root):
+                return f"Error al buscar: {directory} no es un directorio"
+            # Un índice persistente por directorio raíz, reutilizado entre llamadas
+            with self.search_lock:
+                index = self.search_indexes.get(root)
+                if index is None:
+                    index = self.search_indexes[root] = SearchIndex(root)
+            max_results = max(1, min(max_results or DEFAULT_SEARCH_RESULTS, MAX_SEARCH_RESULTS))
+            return index.search(query, max_results)
+        except Exception as e:
+            return f"Error al buscar: {str(e)}"
+        
+        
+    def execute_tool(self, function_name, arguments):
+        # Ejecutar la función correspondiente
+        if function_name == 'list_files_in_dir':
+            return self.list_files_in_dir(**arguments)
+        elif function_name == 'read_file':
+            return self.read_file(**arguments)
+        elif function_name == 'edit_file':
+            return self.edit_file(**arguments)
+        elif function_name == 'search_files':
+            return self.search_files(**arguments)
+        return f"Función desconocida: {function_name}"
+    
+    
+    def run_function_call(self, output):
+        # Devuelve el function_call_output correspondiente a una llamada
+        function_name = output.name
+        
+        print(f'📞 Llamando a la función: {function_name}')
+        print(f'📑 Argumentos: {output.arguments}')
+        
+        try:
+            arguments = json.loads(output.arguments or "{}")
+            result = self.execute_tool(function_name, arguments)
+        except Exception as e:
+            result = f"Error al ejecutar {function_name}: {str(e)}"
+            
+        return {
+            "type": "function_call_output",
+            "call_id": output.call_id,
+            "output": json.dumps(result) if isinstance(result, dict) else result
+        }
+        
+        
+    def prompt_input(self):
+        # Historial compactado dentro del presupuesto de tokens para la petición
+        return self.history.compact(self.messages)
+    
+    
+    def add_user_message(self, content):
+        message = {"role": "user", "content": content}
+        self.messages.append(message)
+        self.pending_input.append(message)
+        
+        
+    def create_response(self, client, **kwargs):
+        # Sirve con cualquier cliente que tenga responses.create (real o de prueba)
+        response = self._send(client, **kwargs)
+        self.response_received(response)
+        return response
+    
+    
+    def stream_turn(self, client, **kwargs):
+        # Igual que create_response + process_response, pero consumiendo el
+        # stream de eventos: el texto se imprime según llega y cada herramienta
+        # se lanza en cuanto sus argumentos están completos
+        start = time.perf_counter()
+        first_token = None
+        printing = False
+        futures = {}
+        response = None
+        
+        for event in self._send(client, stream=True, **kwargs):
+            if event.type in ('response.output_text.delta', 'response.function_call_arguments.delta'):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                if event.type == 'response.output_text.delta':
+                    if not printing:
+                        print('Asistente: ', end='', flush=True)
+                        printing = True
+                    print(event.delta, end='', flush=True)
+            elif event.type == 'response.output_item.done' and event.item.type == 'function_call':
+                futures[event.item.call_id] = self.executor.submit(self.run_function_call, event.item)
+            elif event.type == 'response.completed':
+                response = event.response
+            elif event.type in ('response.failed', 'response.incomplete', 'error'):
+                raise RuntimeError(f'El stream terminó con {event.type}')
+                
+        if printing:
+            print()
+        if response is None:
+            raise RuntimeError('El stream terminó sin response.completed')
+        self.response_received(response)
         
-    def process_response(self, response):
+        total = time.perf_counter() - start
+        self.turn_timings.append({'first_token': first_token, 'total': total})
+        first = f'{first_token:.2f} s' if first_token is not None else '-'
+        print(f'⏱️ Primer token: {first} · Total: {total:.2f} s')
+        
+        return self.process_response(response, futures=futures, echo=False)
+    
+    
+    def request_params(self):
+        # Entrada de la siguiente petición: solo lo nuevo si hay cadena en el
+        # servidor, o el historial compactado completo
+        if self.server_state and self.previous_response_id:
+            print(f'🔗 Encadenado a {self.previous_response_id} ({len(self.pending_input)} elementos nuevos)')
+            return {
+                'input': self.pending_input,
+                'previous_response_id': self.previous_response_id,
+                'tools': self.tools,
+            }
+        return {'input': self.prompt_input(), 'tools': self.tools}
+    
+    
+    def chain_lost(self, error):
+        # True si `error` indica que la respuesta encadenada ya no existe
+        # (caducada o borrada); en ese caso se rompe la cadena para reenviar
+        # el historial completo
+        if not (self.server_state and self.previous_response_id):
+            return False
+        if getattr(error, 'status_code', None) not in (400, 404):
+            return False
+        print(f'⚠️ Cadena {self.previous_response_id} perdida, reenviando el historial completo')
+        self.previous_response_id = None
+        return True
+    
+    
+    def response_received(self, response):
+        self.pending_input = []
+        if self.server_state:
+            self.previous_response_id = response.id
+            
+            
+    def _send(self, client, **kwargs):
+        try:
+            return client.responses.create(**self.request_params(), **kwargs)
+        except Exception as e:
+            if not self.chain_lost(e):
+                raise
+            return client.responses.create(**self.request_params(), **kwargs)
+    
+    
+    def process_response(self, response, futures=None, echo=True):
         # True = si llama a una funcion.False = no hubo llamada.
+        # `futures` trae las herramientas ya lanzadas durante el streaming y
+        # `echo` indica si hay que imprimir el texto (en streaming ya se imprimió)
+        futures = futures or {}
+        function_calls = self.record_response(response, echo)
+        if not function_calls:
+            return False
+        
+        # PROCESAR TODAS LAS LLAMADAS A FUNCIONES EN PARALELO
+        # Se recogen en el orden de las llamadas aunque terminen en otro orden
+        pending = [
+            futures.get(call.call_id) or self.executor.submit(self.run_function_call, call)
+            for call in function_calls
+        ]
+        self.add_tool_outputs([future.result() for future in pending])
+        
+        return True  # Indica que se hizo al menos una llamada a función
+    
+    
+    def record_response(self, response, echo=True):
+        # Guarda la salida en el historial y devuelve las llamadas a funciones
         
         # ALMACENAR PARA HISTORIAL
         self.messages += response.output
         
-        # PROCESAR LLAMADAS A FUNCIONES
+        function_calls = []
         for output in response.output:
             if output.type == 'function_call':
-                function_name = output.name
-                arguments = json.loads(output.arguments)
-                
-                print(f'📞 Llamando a la función: {function_name}')
-                print(f'📑 Argumentos: {arguments}')
-                
-                # Ejecutar la función correspondiente
-                if function_name == 'list_files_in_dir':
-                    result = self.list_files_in_dir(**arguments)
-                elif function_name == 'read_file':
-                    result = self.read_file(**arguments)
-                elif function_name == 'edit_file':
-                    result = self.edit_file(**arguments)
-                else:
-                    result = f"Función desconocida: {function_name}"
-
-                # AGREGAR A LA MEMORIA LA RESPUESTA DE LLAMADO A FUNCIÓN
-                self.messages.append({
-                    "type": "function_call_output",
-                    "call_id": output.call_id,
-                    "output": json.dumps(result) if isinstance(result, dict) else result
-                })
-
-                return True  # Indica que se hizo una llamada a función
+                function_calls.append(output)
                 
-            elif output.type == 'message':
+            elif output.type == 'message' and echo:
                 #print(f'Asistente: {output.content}')
                 reply = '\n'.join(part.text for part in output.content)
                 print(f'Asistente: {reply}')
-                
-        return False
\ No newline at end of file
+        return function_calls
+    
+    
+    def add_tool_outputs(self, results):
+        # AGREGAR A LA MEMORIA LAS RESPUESTAS DE LOS LLAMADOS A FUNCIÓN
+        self.messages += results
+        self.pending_input += results
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import OrderedDict
+
+# TAMAÑO MAXIMO DE LA CACHÉ (por defecto 64 MB)
+DEFAULT_CACHE_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+class FileCache:
+    """Caché LRU compartida por las herramientas del agente.
+
+    Cada entrada se guarda por ruta real junto con su firma (tamaño, mtime_ns):
+    si el archivo o directorio cambia en disco la firma ya no coincide y la
+    entrada se descarta en la siguiente consulta. Las escrituras del propio
+    agente la invalidan explícitamente con `invalidate`.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def signature(info):
+        return (info.st_size, info.st_mtime_ns)
+
+    def get(self, path, info):
+        # Devuelve el valor guardado si la firma coincide con `info` (un os.stat)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry[0] != self.signature(info):
+                if entry is not None:
+                    self._remove(path)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path, info, value, cost):
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            if path in self.entries:
+                self._remove(path)
+            self.entries[path] = (self.signature(info), value, cost)
+            self.current_bytes += cost
+            # EXPULSAR LAS ENTRADAS MENOS USADAS HASTA CABER EN EL TOPE
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+
+    def invalidate(self, path):
+        with self.lock:
+            if path in self.entries:
+                self._remove(path)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, path):
+        _, _, cost = self.entries.pop(path)
+        self.current_bytes -= cost
+
+
+# CACHÉ ÚNICA PARA TODO EL PROCESO
+file_cache = FileCache()
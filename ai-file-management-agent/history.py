@@ -0,0 +1,112 @@
+import os
+import json
+
+# PRESUPUESTO DE TOKENS DEL HISTORIAL QUE SE ENVÍA EN CADA PETICIÓN
+DEFAULT_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 24000))
+KEEP_RECENT_TURNS = 2       # Turnos recientes que nunca se recortan
+STUB_OUTPUT_CHARS = 300     # Caracteres que se conservan de una salida antigua
+MAX_SUMMARY_CHARS = 4000
+CHARS_PER_TOKEN = 4         # Estimación local, sin llamar a ningún tokenizador
+
+
+def _field(item, name):
+    # Los elementos del historial son dicts o objetos del SDK de OpenAI
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def estimate_tokens(item):
+    if isinstance(item, dict):
+        text = json.dumps(item, ensure_ascii=False)
+    elif hasattr(item, 'model_dump_json'):
+        text = item.model_dump_json(exclude_none=True)
+    else:
+        text = str(item)
+    return len(text) // CHARS_PER_TOKEN + 4
+
+
+class HistoryManager:
+    """Mantiene el historial de Agent.messages dentro de un presupuesto de tokens.
+
+    El historial se divide en turnos (cada mensaje del usuario empieza uno).
+    Primero se recortan las salidas de herramientas de los turnos antiguos,
+    conservando su call_id; si aún no cabe, los turnos más antiguos completos
+    se resumen en un texto acumulado, de modo que cada function_call sigue
+    siempre junto a su function_call_output.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, keep_recent_turns=KEEP_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary = ""
+        self.prompt_sizes = []
+
+    def compact(self, messages):
+        # Compacta `messages` en sitio y devuelve la entrada para el modelo
+        system, turns = messages[:1], self._split_turns(messages[1:])
+        old_turns = max(len(turns) - self.keep_recent_turns, 0)
+
+        if self._tokens(system, turns) > self.token_budget:
+            for turn in turns[:old_turns]:
+                turn[:] = [self._stub(item) for item in turn]
+
+        while len(turns) > 1 and old_turns > 0 and self._tokens(system, turns) > self.token_budget:
+            self._fold(turns.pop(0))
+            old_turns -= 1
+
+        messages[:] = system + [item for turn in turns for item in turn]
+        prompt = messages[:1] + self._summary_items() + messages[1:]
+
+        tokens = sum(estimate_tokens(item) for item in prompt)
+        self.prompt_sizes.append(tokens)
+        print(f'📏 Prompt: ~{tokens} tokens ({len(prompt)} elementos, {len(turns)} turnos)')
+        return prompt
+
+    def _split_turns(self, items):
+        turns = []
+        for item in items:
+            if _field(item, 'role') == 'user' or not turns:
+                turns.append([])
+            turns[-1].append(item)
+        return turns
+
+    def _tokens(self, system, turns):
+        items = system + self._summary_items() + [item for turn in turns for item in turn]
+        return sum(estimate_tokens(item) for item in items)
+
+    def _summary_items(self):
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": f"Resumen de la conversación anterior:\n{self.summary}"}]
+
+    def _stub(self, item):
+        output = _field(item, 'output')
+        if _field(item, 'type') != 'function_call_output' or not isinstance(output, str):
+            return item
+        if len(output) <= STUB_OUTPUT_CHARS:
+            return item
+        return {
+            **item,
+            'output': f"{output[:STUB_OUTPUT_CHARS]}\n[... salida antigua omitida: {len(output)} caracteres]",
+        }
+
+    def _fold(self, turn):
+        # Resume un turno en unas pocas líneas
+        lines = []
+        for item in turn:
+            kind = _field(item, 'type')
+            role = _field(item, 'role')
+            if role == 'user':
+                lines.append(f"- Usuario: {str(_field(item, 'content'))[:200]}")
+            elif kind == 'function_call':
+                lines.append(f"  · {_field(item, 'name')}({(_field(item, 'arguments') or '')[:120]})")
+            elif kind == 'message' and role == 'assistant':
+                text = ' '.join(getattr(part, 'text', '') or '' for part in _field(item, 'content') or [])
+                lines.append(f"  Asistente: {text[:300]}")
+        summary = '\n'.join(filter(None, [self.summary] + lines))
+        # Si el resumen crece demasiado se descartan sus líneas más antiguas
+        if len(summary) > MAX_SUMMARY_CHARS:
+            summary = summary[-MAX_SUMMARY_CHARS:]
+            summary = summary[summary.find('\n') + 1:]
+        self.summary = summary
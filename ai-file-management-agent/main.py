@@ -3,11 +3,17 @@ from dotenv import load_dotenv
 import os
 import json
 from agent import Agent
+from file_cache import file_cache
 
 load_dotenv()
 
+MODEL = "gpt-5-nano"
+
 client = OpenAI()
-agent = Agent()
+# AGENT_SERVER_STATE=1 encadena los turnos con previous_response_id
+agent = Agent(server_state=os.getenv("AGENT_SERVER_STATE") == "1")
+# AGENT_STREAM=0 desactiva el streaming y espera la respuesta completa
+STREAM = os.getenv("AGENT_STREAM", "1") != "0"
 
 while True:
     user_input = input("Tú: ").strip()
@@ -17,19 +23,19 @@ while True:
         continue
     if user_input.lower() in {"salir", "exit", "quit", "Taluego!"}:
         print("Asistente: ¡Hasta luego!")
+        stats = file_cache.stats()
+        print(f"📊 Caché de archivos: {stats['hits']} aciertos, {stats['misses']} fallos")
         break
     
     # AGREGAR NUESTRO MENSAJE AL HISTORIAL
-    agent.messages.append({"role": "user", "content": user_input})
+    agent.add_user_message(user_input)
     
     while True:
-        response = client.responses.create(
-            model="gpt-5-nano",
-            input=agent.messages,
-            tools=agent.tools
-        )  
-    
-        called_tool = agent.process_response(response)
+        if STREAM:
+            called_tool = agent.stream_turn(client, model=MODEL)
+        else:
+            response = agent.create_response(client, model=MODEL)
+            called_tool = agent.process_response(response)
         # SI NO HUBO LLAMADA A HERRAMIENTA, MOSTRAR RESPUESTA AL USUARIO
         if not called_tool:
             break
\ No newline at end of file
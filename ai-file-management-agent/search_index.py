@@ -0,0 +1,189 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+# DIRECTORIO DONDE SE GUARDAN LOS ÍNDICES (uno por carpeta indexada)
+INDEX_DIR = os.getenv(
+    "SEARCH_INDEX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "file-management-agent"),
+)
+MAX_INDEXED_BYTES = 2 * 1024 * 1024     # Archivos más grandes no se indexan
+MAX_SNIPPET_CHARS = 200
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".venv", "venv", "env", ".mypy_cache", ".pytest_cache"}
+
+
+def _trigrams(text):
+    # Trigramas en minúsculas de cada línea (las búsquedas son por línea)
+    grams = set()
+    for line in text.lower().splitlines():
+        grams.update(line[i:i + 3] for i in range(len(line) - 2))
+    return grams
+
+
+class SearchIndex:
+    """Índice invertido de trigramas persistido en SQLite.
+
+    Antes de cada búsqueda solo se reindexan los archivos cuyo tamaño o
+    mtime_ns ha cambiado. Los trigramas de la consulta reducen los candidatos
+    y después se confirman las coincidencias leyendo solo esos archivos.
+    """
+
+    def __init__(self, root=".", index_path=None):
+        self.root = os.path.realpath(root)
+        if index_path is None:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16]
+            index_path = os.path.join(INDEX_DIR, f"{digest}.sqlite")
+        self.index_path = index_path
+        # El directorio del propio índice nunca se indexa (p. ej. buscando desde ~)
+        self.index_dir = os.path.realpath(os.path.dirname(os.path.abspath(index_path)))
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(index_path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                binary INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                trigram TEXT NOT NULL,
+                file_id INTEGER NOT NULL,
+                PRIMARY KEY (trigram, file_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+        """)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(files)")}
+        if "binary" not in columns:
+            # Índice de una versión anterior: se reconstruye para marcar los binarios
+            self.connection.executescript("""
+                DELETE FROM postings;
+                DELETE FROM files;
+                ALTER TABLE files ADD COLUMN binary INTEGER NOT NULL DEFAULT 0;
+            """)
+
+    def refresh(self):
+        # Reindexa solo lo que ha cambiado desde la última búsqueda
+        with self.lock:
+            known = {
+                path: (file_id, size, mtime_ns)
+                for file_id, path, size, mtime_ns in self.connection.execute(
+                    "SELECT id, path, size, mtime_ns FROM files"
+                )
+            }
+            updated = 0
+            for path, info in self._walk():
+                previous = known.pop(path, None)
+                if previous is not None and previous[1:] == (info.st_size, info.st_mtime_ns):
+                    continue
+                self._index_file(path, info, previous[0] if previous else None)
+                updated += 1
+
+            # Archivos que ya no existen
+            for file_id, _, _ in known.values():
+                self._forget(file_id)
+            self.connection.commit()
+            return {"updated": updated, "removed": len(known)}
+
+    def search(self, query, max_results=50):
+        start = time.perf_counter()
+        refreshed = self.refresh()
+        needle = query.lower()
+        grams = _trigrams(needle)
+
+        with self.lock:
+            if grams:
+                placeholders = ",".join("?" * len(grams))
+                rows = self.connection.execute(
+                    f"SELECT f.path FROM postings p JOIN files f ON f.id = p.file_id "
+                    f"WHERE p.trigram IN ({placeholders}) "
+                    f"GROUP BY p.file_id HAVING COUNT(*) = ? ORDER BY f.path",
+                    (*grams, len(grams)),
+                ).fetchall()
+            else:
+                # Consultas de menos de 3 caracteres: todos los archivos de texto son candidatos
+                rows = self.connection.execute("SELECT path FROM files WHERE NOT binary ORDER BY path").fetchall()
+
+        hits = []
+        truncated = False
+        for (path,) in rows:
+            for line_number, line in self._matching_lines(path, needle):
+                if len(hits) >= max_results:
+                    truncated = True
+                    break
+                snippet = line.strip()[:MAX_SNIPPET_CHARS]
+                hits.append(f"{os.path.relpath(path, self.root)}:{line_number}:{snippet}")
+            if truncated:
+                break
+
+        return {
+            "query": query,
+            "hits": hits,
+            "truncated": truncated,
+            "candidates": len(rows),
+            "reindexed": refreshed["updated"],
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _walk(self):
+        pending = [self.root]
+        while pending:
+            current = pending.pop()
+            try:
+                iterator = os.scandir(current)
+            except OSError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS and os.path.realpath(entry.path) != self.index_dir:
+                                pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            info = entry.stat(follow_symlinks=False)
+                            if info.st_size <= MAX_INDEXED_BYTES:
+                                yield entry.path, info
+                    except OSError:
+                        continue
+
+    def _index_file(self, path, info, file_id):
+        if file_id is not None:
+            self._forget(file_id)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return
+        # Los binarios se registran (para no releerlos) pero sin trigramas
+        binary = b"\0" in data[:8192]
+        grams = set() if binary else _trigrams(data.decode("utf-8", errors="ignore"))
+
+        cursor = self.connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, binary) VALUES (?, ?, ?, ?)",
+            (path, info.st_size, info.st_mtime_ns, binary),
+        )
+        self.connection.executemany(
+            "INSERT INTO postings (trigram, file_id) VALUES (?, ?)",
+            ((gram, cursor.lastrowid) for gram in grams),
+        )
+
+    def _forget(self, file_id):
+        self.connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    @staticmethod
+    def _matching_lines(path, needle):
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as file:
+                for line_number, line in enumerate(file, 1):
+                    if needle in line.lower():
+                        yield line_number, line
+        except OSError:
+            return
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from agent import Agent
+
+load_dotenv()
+
+MODEL = os.getenv("AGENT_MODEL", "gpt-5-nano")
+HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("SERVICE_PORT", 8765))
+SANDBOX_ROOT = os.getenv("SERVICE_SANDBOX_ROOT", "./sandboxes")
+MAX_CONCURRENT_TURNS = int(os.getenv("SERVICE_MAX_CONCURRENT_TURNS", 32))   # Límite global de turnos a la vez
+TOOL_WORKERS = int(os.getenv("SERVICE_TOOL_WORKERS", 16))                   # Hilos para las herramientas de archivos
+MAX_CONNECTIONS = int(os.getenv("SERVICE_MAX_CONNECTIONS", 64))             # Conexiones HTTP a OpenAI
+SESSION_IDLE_SECONDS = int(os.getenv("SERVICE_SESSION_IDLE_SECONDS", 3600))
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class AgentService:
+    """Sirve muchas conversaciones a la vez sobre la clase Agent.
+
+    Cada sesión tiene su propio Agent (historial) y su propio directorio
+    sandbox. Las peticiones a OpenAI comparten un cliente asíncrono con pool de
+    conexiones, las herramientas (bloqueantes) se ejecutan en un pool de hilos
+    acotado y un semáforo limita los turnos en curso en todo el servicio.
+    """
+
+    def __init__(self, sandbox_root=SANDBOX_ROOT, max_concurrent_turns=MAX_CONCURRENT_TURNS,
+                 tool_workers=TOOL_WORKERS, max_connections=MAX_CONNECTIONS, client=None):
+        self.sandbox_root = os.path.realpath(sandbox_root)
+        self.client = client or AsyncOpenAI(
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+        self.executor = ThreadPoolExecutor(max_workers=tool_workers)
+        self.turn_slots = asyncio.Semaphore(max_concurrent_turns)
+        self.sessions = {}
+
+    def get_session(self, session_id):
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"session_id no válido: {session_id!r}")
+        self._evict_idle()
+        session = self.sessions.get(session_id)
+        if session is None:
+            root_dir = os.path.join(self.sandbox_root, session_id)
+            os.makedirs(root_dir, exist_ok=True)
+            session = self.sessions[session_id] = {
+                "agent": Agent(root_dir=root_dir, executor=self.executor),
+                "lock": asyncio.Lock(),
+                "last_used": time.monotonic(),
+            }
+        session["last_used"] = time.monotonic()
+        return session
+
+    async def chat(self, session_id, message):
+        session = self.get_session(session_id)
+        agent = session["agent"]
+        loop = asyncio.get_running_loop()
+
+        # Los turnos de una misma sesión van en orden; los de sesiones
+        # distintas avanzan en paralelo hasta el límite global
+        async with session["lock"], self.turn_slots:
+            agent.add_user_message(message)
+            while True:
+                response = await self._create(agent)
+                function_calls = agent.record_response(response, echo=False)
+                if not function_calls:
+                    return self._reply_text(response)
+
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(self.executor, agent.run_function_call, call)
+                    for call in function_calls
+                ))
+                agent.add_tool_outputs(list(results))
+
+    async def close(self):
+        await self.client.close()
+        self.executor.shutdown(wait=False)
+
+    async def _create(self, agent):
+        try:
+            response = await self.client.responses.create(model=MODEL, **agent.request_params())
+        except Exception as e:
+            if not agent.chain_lost(e):
+                raise
+            response = await self.client.responses.create(model=MODEL, **agent.request_params())
+        agent.response_received(response)
+        return response
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session["last_used"] > SESSION_IDLE_SECONDS and not session["lock"].locked():
+                del self.sessions[session_id]
+
+    @staticmethod
+    def _reply_text(response):
+        return "\n".join(
+            part.text
+            for output in response.output if output.type == "message"
+            for part in output.content
+        )
+
+
+async def handle_connection(service, reader, writer):
+    # Protocolo de líneas JSON: {"session_id": "...", "message": "..."}
+    # Las peticiones de una conexión se atienden en paralelo y cada respuesta
+    # lleva el mismo "id" que su petición
+    write_lock = asyncio.Lock()
+
+    async def answer(request):
+        start = time.perf_counter()
+        try:
+            reply = {"reply": await service.chat(request["session_id"], request["message"])}
+        except Exception as e:
+            reply = {"error": str(e)}
+        reply.update(id=request.get("id"), session_id=request.get("session_id"),
+                     elapsed_seconds=round(time.perf_counter() - start, 3))
+        async with write_lock:
+            writer.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+
+    tasks = set()
+    try:
+        while line := await reader.readline():
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            task = asyncio.create_task(answer(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+
+
+async def main():
+    service = AgentService()
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), HOST, PORT
+    )
+    print(f"🚀 Servicio escuchando en {HOST}:{PORT} (sandbox: {service.sandbox_root})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
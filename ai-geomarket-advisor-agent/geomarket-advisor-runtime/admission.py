@@ -0,0 +1,88 @@
+import time
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+
+class Saturated(Exception):
+    """Raised when a run is not admitted; maps to HTTP 429."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limits agent runs globally and per user, with a bounded wait queue.
+
+    At most ``max_concurrent`` runs execute at once. Further runs wait in a
+    queue of at most ``max_queue`` entries for up to ``max_wait`` seconds. A
+    user may have at most ``max_per_user`` runs executing or waiting. Anything
+    beyond that is rejected immediately with ``Saturated``, so a spike turns
+    into fast 429s instead of a pile of slow requests.
+    """
+
+    def __init__(self, max_concurrent, max_per_user, max_queue, max_wait, retry_after):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._per_user = defaultdict(int)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    @asynccontextmanager
+    async def admit(self, user_id):
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            self.rejected += 1
+            raise Saturated(f"Too many concurrent analyses for user {user_id}.", self.retry_after)
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Saturated("The server is busy, try again later.", self.retry_after)
+
+        self._per_user[user_id] += 1
+        try:
+            await self._wait_for_slot()
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+                self._slots.release()
+        finally:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+
+    async def _wait_for_slot(self):
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Saturated("Timed out waiting for a free slot, try again later.", self.retry_after) from None
+        finally:
+            self.queued -= 1
+        waited = time.perf_counter() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_observed_wait = max(self.max_observed_wait, waited)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 3) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_observed_wait, 3),
+        }
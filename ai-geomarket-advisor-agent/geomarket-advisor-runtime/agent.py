@@ -1,15 +1,84 @@
 import os
+import config
+import metrics
 from google.adk.agents import LlmAgent
+from google.adk.tools import FunctionTool, ToolContext
 from google.adk.tools.mcp_tool import McpToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
+from mcp_cache import CachingToolset, ToolResultCache
+from mcp_pool import McpServerPool
+from density import DEFAULT_COMPLEMENTARY, DensityEngine
 
+# Shared by every agent run in this process so that all turns reuse results
+maps_tool_cache = ToolResultCache(
+    max_entries=config.MCP_CACHE_MAX_ENTRIES,
+    default_ttl=config.MCP_CACHE_DEFAULT_TTL_SECONDS,
+)
 
-def build_business_agent():
+
+def build_maps_pool():
     google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not google_maps_api_key:
         raise ValueError("Missing GOOGLE_MAPS_API_KEY in env (.env)")
 
+    def new_maps_server():
+        return McpToolset(
+            connection_params=StdioConnectionParams(
+                server_params=StdioServerParameters(
+                    command=config.MAPS_MCP_COMMAND,
+                    args=config.MAPS_MCP_ARGS,
+                    env={"GOOGLE_MAPS_API_KEY": google_maps_api_key},
+                )
+            )
+        )
+
+    return McpServerPool(
+        new_maps_server,
+        size=config.MCP_POOL_SIZE,
+        health_interval=config.MCP_HEALTH_INTERVAL_SECONDS,
+        startup_timeout=config.MCP_STARTUP_TIMEOUT_SECONDS,
+    )
+
+
+def build_density_tool(maps_pool):
+    async def call_maps_tool(tool_name, args, tool_context):
+        return await maps_tool_cache.get_or_call(
+            tool_name, args, lambda: maps_pool.call(tool_name, args, tool_context)
+        )
+
+    engine = DensityEngine(
+        call_maps_tool,
+        max_entries=config.DENSITY_CACHE_MAX_ENTRIES,
+        ttl=config.DENSITY_CACHE_TTL_SECONDS,
+        precision=config.DENSITY_GRID_PRECISION,
+    )
+
+    async def score_zones(city: str, business_type: str, complementary: str = "", tool_context: ToolContext = None) -> dict:
+        """Scores the zones of a city for opening a business of the given type.
+
+        Fetches competitors and complementary points of interest (places that
+        attract the same customers) from Google Maps, buckets them into a
+        geohash grid and returns the best zones. Each zone has its center,
+        competitor and complementary counts, average competitor rating and a
+        0-100 opportunity score (higher means more demand and less, or weaker,
+        competition).
+
+        Args:
+            city: City to analyze, e.g. "Málaga".
+            business_type: Type of business, e.g. "bakery".
+            complementary: Comma-separated place types that bring customers to
+                this business, e.g. "office, school, gym". Leave empty for a
+                generic set.
+        """
+        terms = [term for term in complementary.split(",") if term.strip()] or DEFAULT_COMPLEMENTARY
+        return await engine.top_zones(city, business_type, terms, config.DENSITY_TOP_ZONES, tool_context)
+
+    return FunctionTool(score_zones)
+
+
+def build_business_agent(maps_pool):
+
     instruction = """
 You are GeoMarket Advisor, an expert AI agent specialized in strategic business location analysis.
 
@@ -26,7 +95,12 @@ Every response must include:
 
 4. A clear, data-driven justification for your recommendations
 
-Use only information obtained through Google Maps MCP.
+Start every analysis by calling score_zones. It scores the whole city from Google Maps data and returns the best zones with their
+competitor counts, complementary points of interest and an opportunity score. Base your recommendations on those rows, and use the
+Google Maps tools only to look up details of the zones you recommend. If score_zones returns an error, say so and carry out the
+analysis with the Google Maps tools directly; if it returns a warning, mention that the scores are based on partial data.
+
+Use only information obtained through Google Maps MCP or derived from it by score_zones.
 Do not fabricate data, infer nonexistent metrics, or make unsupported assumptions.
 Base all insights strictly on observable patterns from the retrieved map data and your analytical reasoning.
 """
@@ -35,15 +109,9 @@ Base all insights strictly on observable patterns from the retrieved map data an
         model="gemini-2.5-flash",
         name="GeoMarketAdvisor",
         instruction=instruction,
-        tools=[
-            McpToolset(
-                connection_params=StdioConnectionParams(
-                    server_params=StdioServerParameters(
-                        command="npx",
-                        args=["-y", "@modelcontextprotocol/server-google-maps"],
-                        env={"GOOGLE_MAPS_API_KEY": google_maps_api_key},
-                    )
-                )
-            )
-        ],
+        tools=[build_density_tool(maps_pool), CachingToolset(maps_pool, maps_tool_cache)],
+        before_model_callback=metrics.before_model,
+        after_model_callback=metrics.after_model,
+        before_tool_callback=metrics.before_tool,
+        after_tool_callback=metrics.after_tool,
     )
@@ -1,6 +1,59 @@
 import os
+import shlex
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Response cache for /run, keyed by normalized (business type, city)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 24 * 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+
+# Agent sessions, shared by every uvicorn worker through one SQLite file
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.sqlite3")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 3600))
+SESSION_MAX_EVENTS = int(os.getenv("SESSION_MAX_EVENTS", 60))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 1000))
+
+# Admission control for agent runs. Beyond these limits requests get a
+# 429 with Retry-After instead of queueing without bound
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", 8))
+MAX_RUNS_PER_USER = int(os.getenv("MAX_RUNS_PER_USER", 4))
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", 32))
+MAX_QUEUE_WAIT_SECONDS = float(os.getenv("MAX_QUEUE_WAIT_SECONDS", 30))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 5))
+
+# Background jobs (/jobs). A running job whose worker disappeared is
+# picked up again once its lease expires
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 900))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+JOB_MAX_WAIT_SECONDS = float(os.getenv("JOB_MAX_WAIT_SECONDS", 30))
+
+# /run/batch: largest batch accepted and analyses run at once per batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+
+# Google Maps MCP server. Point these at a pre-installed server binary to
+# skip npm resolution at startup, or at a local stand-in server for tests
+MAPS_MCP_COMMAND = os.getenv("MAPS_MCP_COMMAND", "npx")
+MAPS_MCP_ARGS = shlex.split(os.getenv("MAPS_MCP_ARGS", "-y @modelcontextprotocol/server-google-maps"))
+
+# score_zones: geohash precision of the grid (6 is about 1.2 x 0.6 km),
+# zones returned to the model and cache of scored grids per (city, category)
+DENSITY_GRID_PRECISION = int(os.getenv("DENSITY_GRID_PRECISION", 6))
+DENSITY_TOP_ZONES = int(os.getenv("DENSITY_TOP_ZONES", 5))
+DENSITY_CACHE_MAX_ENTRIES = int(os.getenv("DENSITY_CACHE_MAX_ENTRIES", 200))
+DENSITY_CACHE_TTL_SECONDS = int(os.getenv("DENSITY_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Pool of long-lived MCP server processes
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", 4))
+MCP_HEALTH_INTERVAL_SECONDS = int(os.getenv("MCP_HEALTH_INTERVAL_SECONDS", 30))
+MCP_STARTUP_TIMEOUT_SECONDS = int(os.getenv("MCP_STARTUP_TIMEOUT_SECONDS", 60))
+
+# In-process cache of Maps MCP tool results (per-tool TTLs live in mcp_cache.py)
+MCP_CACHE_MAX_ENTRIES = int(os.getenv("MCP_CACHE_MAX_ENTRIES", 5000))
+MCP_CACHE_DEFAULT_TTL_SECONDS = int(os.getenv("MCP_CACHE_DEFAULT_TTL_SECONDS", 3600))
@@ -0,0 +1,230 @@
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from response_cache import analysis_key
+
+logger = logging.getLogger(__name__)
+
+BASE32 = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+# What tends to bring customers to a business besides the business itself
+DEFAULT_COMPLEMENTARY = ["supermarket", "office", "school", "transit station"]
+
+DEFAULT_RATING = 3.5            # Used for places without a rating
+SEARCH_OFFSET_KM = 3.0          # Distance of the four extra search points from the city center
+SEARCH_RADIUS_M = 3000
+
+
+def geohash(lat, lng, precision):
+    """Vectorized geohash of arrays of coordinates.
+
+    Returns the cell labels plus the latitude and longitude of each cell
+    center.
+    """
+    bits = 5 * precision
+    lng_bits, lat_bits = (bits + 1) // 2, bits // 2
+    lng_index = np.minimum(((lng + 180.0) / 360.0 * (1 << lng_bits)).astype(np.int64), (1 << lng_bits) - 1)
+    lat_index = np.minimum(((lat + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), (1 << lat_bits) - 1)
+
+    # Interleave the bits, longitude first, most significant bit first
+    code = np.zeros_like(lng_index)
+    for bit in range(bits):
+        if bit % 2 == 0:
+            source, shift = lng_index, lng_bits - 1 - bit // 2
+        else:
+            source, shift = lat_index, lat_bits - 1 - bit // 2
+        code = (code << 1) | ((source >> shift) & 1)
+
+    chars = np.stack([(code >> (5 * (precision - 1 - i))) & 31 for i in range(precision)], axis=-1)
+    labels = np.array(["".join(row) for row in BASE32[chars]]) if len(code) else np.array([], dtype=str)
+    center_lng = (lng_index + 0.5) * 360.0 / (1 << lng_bits) - 180.0
+    center_lat = (lat_index + 0.5) * 180.0 / (1 << lat_bits) - 90.0
+    return labels, center_lat, center_lng
+
+
+def score_cells(competitors, complementary, precision=6):
+    """Bucket places into geohash cells and score every occupied cell.
+
+    ``competitors`` and ``complementary`` are arrays of (lat, lng, rating)
+    rows. Complementary places raise a cell's score (they bring customers),
+    competitors lower it, both weighted by rating so that a 4.8 competitor
+    weighs more than a 3.0 one. Scores are scaled to 0-100.
+    """
+    points = np.concatenate([competitors, complementary]) if len(complementary) else competitors
+    if not len(points):
+        return []
+    is_competitor = np.arange(len(points)) < len(competitors)
+    labels, center_lat, center_lng = geohash(points[:, 0], points[:, 1], precision)
+    cells, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+
+    weight = points[:, 2] / 5.0
+    competitor_count = np.bincount(inverse, weights=is_competitor, minlength=len(cells))
+    complementary_count = np.bincount(inverse, weights=~is_competitor, minlength=len(cells))
+    pressure = np.bincount(inverse, weights=weight * is_competitor, minlength=len(cells))
+    demand = np.bincount(inverse, weights=weight * ~is_competitor, minlength=len(cells))
+    rating_sum = np.bincount(inverse, weights=points[:, 2] * is_competitor, minlength=len(cells))
+
+    opportunity = (1.0 + demand) / (1.0 + pressure)
+    score = 100.0 * opportunity / opportunity.max()
+    avg_rating = np.divide(rating_sum, competitor_count, out=np.zeros_like(rating_sum), where=competitor_count > 0)
+
+    order = np.argsort(-score, kind="stable")
+    return [
+        {
+            "zone": str(cells[i]),
+            "lat": round(float(center_lat[first[i]]), 5),
+            "lng": round(float(center_lng[first[i]]), 5),
+            "competitors": int(competitor_count[i]),
+            "complementary": int(complementary_count[i]),
+            "avg_competitor_rating": round(float(avg_rating[i]), 2) if competitor_count[i] else None,
+            "score": round(float(score[i]), 1),
+        }
+        for i in order
+    ]
+
+
+class MapsCallError(Exception):
+    """A Maps MCP call needed for the grid failed."""
+
+
+def tool_error(result):
+    # Error text of a failed McpTool result, or None if the call succeeded
+    if not isinstance(result, dict):
+        return None
+    if "error" in result:
+        return str(result["error"])
+    if result.get("isError"):
+        texts = [item.get("text", "") for item in result.get("content", []) if item.get("type") == "text"]
+        return " ".join(texts).strip() or "unknown error"
+    return None
+
+
+def parse_tool_result(result):
+    # McpTool returns the CallToolResult as a dict whose text content is the
+    # JSON produced by the Google Maps MCP server
+    for item in (result or {}).get("content", []):
+        if item.get("type") == "text":
+            try:
+                return json.loads(item["text"])
+            except ValueError:
+                return {}
+    return {}
+
+
+def places_array(places):
+    rows = [
+        (place["location"]["lat"], place["location"]["lng"], place.get("rating") or DEFAULT_RATING)
+        for place in places.values()
+        if place.get("location")
+    ]
+    return np.array(rows, dtype=float).reshape(-1, 3)
+
+
+def search_points(lat, lng):
+    # City center plus four points SEARCH_OFFSET_KM away, since a single
+    # search returns only about 20 places
+    dlat = SEARCH_OFFSET_KM / 110.574
+    dlng = SEARCH_OFFSET_KM / (111.320 * math.cos(math.radians(lat)))
+    return [(lat, lng), (lat + dlat, lng), (lat - dlat, lng), (lat, lng + dlng), (lat, lng - dlng)]
+
+
+class DensityEngine:
+    """Competition-density scoring over places fetched from the Maps MCP.
+
+    ``call_tool(tool_name, args, tool_context)`` runs one Maps MCP tool.
+    Scored grids are kept in an in-process LRU per (city, category).
+    """
+
+    def __init__(self, call_tool, max_entries=200, ttl=24 * 3600, precision=6):
+        self.call_tool = call_tool
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        self.grids = OrderedDict()
+
+    async def top_zones(self, city, category, complementary, top_k, tool_context):
+        complementary = sorted({term.strip().lower() for term in complementary if term.strip()})
+        key = (analysis_key(category, city), tuple(complementary))
+        failed_searches = 0
+        entry = self.grids.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.grids.move_to_end(key)
+            cells, place_count = entry[1], entry[2]
+        else:
+            # Errors go back to the model as the tool result instead of
+            # aborting the run
+            try:
+                cells, place_count, failed_searches = await self._build(city, category, complementary, tool_context)
+            except MapsCallError as e:
+                return {"city": city, "category": category, "error": str(e)}
+            except Exception as e:
+                logger.exception("Scoring %s in %s failed", category, city)
+                return {"city": city, "category": category, "error": f"Zone scoring failed: {e}"}
+            # A grid built from incomplete data is returned but not kept
+            if not failed_searches:
+                self.grids[key] = (time.monotonic() + self.ttl, cells, place_count)
+                self.grids.move_to_end(key)
+                while len(self.grids) > self.max_entries:
+                    self.grids.popitem(last=False)
+
+        result = {
+            "city": city,
+            "category": category,
+            "complementary": complementary,
+            "grid": f"geohash{self.precision}",
+            "places": place_count,
+            "cells": len(cells),
+            "top_zones": cells[:top_k],
+        }
+        if failed_searches:
+            result["failed_searches"] = failed_searches
+            result["warning"] = f"{failed_searches} Maps searches failed; the scores are based on partial data"
+        return result
+
+    async def _build(self, city, category, complementary, tool_context):
+        result = await self.call_tool("maps_geocode", {"address": city}, tool_context)
+        error = tool_error(result)
+        if error:
+            raise MapsCallError(f"Geocoding {city!r} failed: {error}")
+        location = parse_tool_result(result).get("location")
+        if not location:
+            raise MapsCallError(f"Could not geocode {city!r}")
+
+        (competitors, competitor_failures), (others, other_failures) = await asyncio.gather(
+            self._search([category], location, tool_context),
+            self._search(complementary, location, tool_context),
+        )
+        if competitor_failures == len(search_points(location["lat"], location["lng"])):
+            # Without any competitor data the scores would be meaningless
+            raise MapsCallError(f"Every Maps search for {category!r} failed")
+        # A place that matches both searches counts as a competitor only
+        for place_id in competitors:
+            others.pop(place_id, None)
+        cells = score_cells(places_array(competitors), places_array(others), self.precision)
+        return cells, len(competitors) + len(others), competitor_failures + other_failures
+
+    async def _search(self, terms, location, tool_context):
+        calls = [
+            self.call_tool(
+                "maps_search_places",
+                {"query": term, "location": {"latitude": lat, "longitude": lng}, "radius": SEARCH_RADIUS_M},
+                tool_context,
+            )
+            for term in terms
+            for lat, lng in search_points(location["lat"], location["lng"])
+        ]
+        places = {}
+        failures = 0
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, Exception) or tool_error(result):
+                failures += 1
+                continue
+            for place in parse_tool_result(result).get("places", []):
+                places[place.get("place_id") or place.get("name")] = place
+        return places, failures
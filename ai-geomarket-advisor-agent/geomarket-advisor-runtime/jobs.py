@@ -0,0 +1,191 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("done", "failed")
+
+
+class JobStore:
+    """Persistent table of analysis jobs in a SQLite file.
+
+    Jobs go queued -> running -> done | failed. A running job holds a lease;
+    when its worker dies (crash, restart) the lease expires and another
+    worker, in this or any other process, claims it again.
+    """
+
+    def __init__(self, path, lease_seconds, retention_seconds):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def create(self, payload):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, payload, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, json.dumps(payload), now),
+            )
+            connection.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (now - self.retention_seconds,),
+            )
+        return job_id
+
+    def claim(self):
+        # BEGIN IMMEDIATE serializes claims across processes
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'queued' OR (status = 'running' AND started_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - self.lease_seconds,),
+            ).fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (now, row[0]))
+            connection.execute("COMMIT")
+        return (row[0], json.loads(row[1])) if row else None
+
+    def finish(self, job_id, result):
+        self._update(job_id, "done", json.dumps(result), None)
+
+    def fail(self, job_id, error):
+        self._update(job_id, "failed", None, error)
+
+    def requeue(self, job_id):
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ?", (job_id,))
+
+    def _update(self, job_id, status, result, error):
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT status, result, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, error, created_at, started_at, finished_at = row
+        job = {"job_id": job_id, "status": status, "created_at": created_at}
+        if started_at:
+            job["started_at"] = started_at
+        if status in FINISHED:
+            job["finished_at"] = finished_at
+            job["elapsed_seconds"] = round(finished_at - created_at, 3)
+        if result is not None:
+            job.update(json.loads(result))
+        if error is not None:
+            job["error"] = error
+        return job
+
+    def stats(self):
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class JobWorkers:
+    """Pool of asyncio workers that execute queued jobs with ``handler``.
+
+    ``handler(payload)`` is a coroutine returning a JSON-serializable dict
+    that becomes the job result. Workers wake up as soon as a job is
+    submitted in this process, and poll for jobs submitted elsewhere.
+    """
+
+    def __init__(self, store, handler, workers=4, poll_interval=1.0):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._submitted = asyncio.Event()
+        self._finished = asyncio.Condition()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, payload):
+        job_id = await asyncio.to_thread(self.store.create, payload)
+        self._submitted.set()
+        return job_id
+
+    async def wait(self, job_id, timeout):
+        # Long-poll: return as soon as the job finishes or the timeout expires
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED or remaining <= 0:
+                return job
+            async with self._finished:
+                try:
+                    await asyncio.wait_for(self._finished.wait(), timeout=min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _work(self):
+        while True:
+            self._submitted.clear()
+            claimed = await asyncio.to_thread(self.store.claim)
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._submitted.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, payload = claimed
+            try:
+                result = await self.handler(payload)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job to whoever runs next
+                await asyncio.shield(asyncio.to_thread(self.store.requeue, job_id))
+                raise
+            except Exception as e:
+                logger.exception("Job %s failed", job_id)
+                await asyncio.to_thread(self.store.fail, job_id, str(e))
+            else:
+                await asyncio.to_thread(self.store.finish, job_id, result)
+            async with self._finished:
+                self._finished.notify_all()
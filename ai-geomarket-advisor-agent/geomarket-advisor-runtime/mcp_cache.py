@@ -0,0 +1,158 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# How long each Google Maps MCP result stays valid. Geocoding and elevation
+# barely change, place listings and details change slowly, routes depend on
+# traffic.
+DEFAULT_TOOL_TTLS = {
+    "maps_geocode": 30 * DAY,
+    "maps_reverse_geocode": 30 * DAY,
+    "maps_elevation": 30 * DAY,
+    "maps_place_details": 7 * DAY,
+    "maps_search_places": DAY,
+    "maps_distance_matrix": HOUR,
+    "maps_directions": HOUR,
+}
+
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {key: _canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def tool_call_key(tool_name, args):
+    canonical = json.dumps(_canonical(args or {}), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return f"{tool_name}:{canonical}"
+
+
+def _is_error(result):
+    # McpTool returns the CallToolResult as a dict; errors must not be cached
+    return isinstance(result, dict) and (result.get("isError") or "error" in result)
+
+
+class ToolResultCache:
+    """In-process LRU of MCP tool results with per-entry expiry.
+
+    Identical calls that arrive while the first one is still running wait for
+    it instead of hitting the MCP server again (request coalescing).
+    """
+
+    def __init__(self, max_entries=5000, default_ttl=HOUR, ttls=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = {**DEFAULT_TOOL_TTLS, **(ttls or {})}
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_call(self, tool_name, args, call):
+        key = tool_call_key(tool_name, args)
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self.entries[key]
+
+        while key in self.in_flight:
+            flight = self.in_flight[key]
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # Only the first caller was cancelled (client gone, batch
+                # cancelled); make the call here instead of failing too
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Nobody else may be waiting; avoid "exception never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if not _is_error(result):
+                self._store(key, self.ttls.get(tool_name, self.default_ttl), result)
+            return result
+        finally:
+            del self.in_flight[key]
+
+    def _store(self, key, ttl, result):
+        self.entries[key] = (time.monotonic() + ttl, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+        }
+
+
+class CachedTool(BaseTool):
+    """Wraps a single MCP tool and routes its calls through the cache."""
+
+    def __init__(self, tool: BaseTool, cache: ToolResultCache):
+        super().__init__(name=tool.name, description=tool.description, is_long_running=tool.is_long_running)
+        self._tool = tool
+        self._cache = cache
+
+    def _get_declaration(self):
+        return self._tool._get_declaration()
+
+    async def run_async(self, *, args, tool_context):
+        return await self._cache.get_or_call(
+            self.name, args, lambda: self._tool.run_async(args=args, tool_context=tool_context)
+        )
+
+
+class CachingToolset(BaseToolset):
+    """Toolset decorator that caches every tool of the wrapped toolset."""
+
+    def __init__(self, toolset: BaseToolset, cache: ToolResultCache):
+        super().__init__()
+        self._toolset = toolset
+        self.cache = cache
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> list[BaseTool]:
+        tools = await self._toolset.get_tools(readonly_context)
+        return [CachedTool(tool, self.cache) for tool in tools]
+
+    async def close(self) -> None:
+        await self._toolset.close()
@@ -0,0 +1,226 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool import McpToolset
+
+from metrics import MCP_ERRORS, MCP_LATENCY
+
+logger = logging.getLogger(__name__)
+
+RESTART_ATTEMPTS = 3        # Tries per restart before the slot is left empty
+RESTART_BACKOFF = 1.0       # Seconds before the second try, doubled after each failure
+
+
+class PoolUnavailable(Exception):
+    """No MCP server process became free in time."""
+
+
+class McpServerPool(BaseToolset):
+    """Pool of long-lived MCP server processes exposed as a single toolset.
+
+    Every member is its own McpToolset, i.e. its own child process and stdio
+    session. Each tool call borrows an idle member for its duration, so
+    concurrent runs no longer queue behind a single pipe. Members are started
+    and listed up front (``start``), checked periodically and restarted when
+    they crash or stop answering. A member that can't be restarted leaves its
+    slot empty (the pool is degraded) and the health check keeps trying to
+    fill it; meanwhile calls that find no free member within
+    ``startup_timeout`` fail instead of waiting forever.
+    """
+
+    def __init__(self, factory: Callable[[], McpToolset], size=4, health_interval=30, startup_timeout=60):
+        super().__init__()
+        self._factory = factory
+        self.size = size
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+        self._idle: Optional[asyncio.Queue] = None
+        # Every live member by id, idle or not: borrowed and restarting
+        # members must be stopped on shutdown too
+        self._members = {}
+        self._member_tools = {}
+        self._prototypes = []
+        self._health_task = None
+        self._background = set()
+        self._start_lock = asyncio.Lock()
+        self.restarts = 0
+        self.missing = 0
+
+    async def start(self):
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            members = await asyncio.gather(*(self._spawn() for _ in range(self.size)), return_exceptions=True)
+            errors = [member for member in members if isinstance(member, BaseException)]
+            if errors:
+                # Don't leave the processes that did start running
+                for member in members:
+                    if not isinstance(member, BaseException):
+                        await self._stop(member)
+                raise errors[0]
+            self._idle = asyncio.Queue()
+            for member in members:
+                self._idle.put_nowait(member)
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info("Started %d MCP server processes", self.size)
+
+    async def get_tools(self, readonly_context: Optional[ReadonlyContext] = None) -> list[BaseTool]:
+        await self.start()
+        return [PooledTool(self, prototype) for prototype in self._prototypes]
+
+    async def call(self, tool_name, args, tool_context):
+        async with self._borrow() as member:
+            tool = self._member_tools[id(member)][tool_name]
+            start = time.perf_counter()
+            try:
+                return await tool.run_async(args=args, tool_context=tool_context)
+            except Exception:
+                MCP_ERRORS.labels(tool_name).inc()
+                raise
+            finally:
+                MCP_LATENCY.labels(tool_name).observe(time.perf_counter() - start)
+
+    async def close(self) -> None:
+        # Stop the tasks that take members out of the queue first, then every
+        # member wherever it is: idle, borrowed by a call or being restarted
+        tasks = [task for task in (self._health_task, *self._background) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._health_task = None
+        self._idle = None
+        for member in list(self._members.values()):
+            await self._stop(member)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "running": len(self._members),
+            "restarts": self.restarts,
+            "missing": self.missing,
+            "degraded": self.missing > 0,
+        }
+
+    async def _spawn(self):
+        # Spawning and listing the tools is both the warm-up and the health check
+        member = self._factory()
+        self._members[id(member)] = member
+        try:
+            tools = await asyncio.wait_for(member.get_tools(), timeout=self.startup_timeout)
+        except BaseException:
+            await self._stop(member)
+            raise
+        self._member_tools[id(member)] = {tool.name: tool for tool in tools}
+        if not self._prototypes:
+            self._prototypes = tools
+        return member
+
+    async def _stop(self, member):
+        self._members.pop(id(member), None)
+        self._member_tools.pop(id(member), None)
+        try:
+            await member.close()
+        except Exception:
+            logger.exception("Error closing MCP server process")
+
+    async def _replace(self, member):
+        # Returns the new member, or None when the slot was left empty
+        await self._stop(member)
+        self.restarts += 1
+        delay = RESTART_BACKOFF
+        for attempt in range(1, RESTART_ATTEMPTS + 1):
+            try:
+                return await self._spawn()
+            except Exception:
+                logger.exception("Could not restart MCP server process (attempt %d/%d)", attempt, RESTART_ATTEMPTS)
+            if attempt < RESTART_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        self.missing += 1
+        logger.error("MCP server pool degraded: %d of %d processes missing", self.missing, self.size)
+        return None
+
+    @asynccontextmanager
+    async def _borrow(self):
+        await self.start()
+        try:
+            member = await asyncio.wait_for(self._idle.get(), timeout=self.startup_timeout)
+        except asyncio.TimeoutError:
+            raise PoolUnavailable(
+                f"No Google Maps MCP server became available within {self.startup_timeout:g}s"
+                f" ({self.missing} of {self.size} processes down)"
+            ) from None
+        try:
+            yield member
+        except Exception:
+            # A transport error usually means the child died: replace it in
+            # the background before it goes back to the pool
+            task = asyncio.create_task(self._recycle(member))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            raise
+        except BaseException:
+            self._release(member)
+            raise
+        else:
+            self._release(member)
+
+    def _release(self, member):
+        # After close() the member has already been stopped
+        if self._idle is not None and id(member) in self._members:
+            self._idle.put_nowait(member)
+
+    async def _recycle(self, member):
+        member = await self._replace(member)
+        if member is not None:
+            self._release(member)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            # Only idle members are checked; busy ones are proving themselves
+            for _ in range(self._idle.qsize()):
+                member = self._idle.get_nowait()
+                try:
+                    await asyncio.wait_for(member.get_tools(), timeout=self.startup_timeout)
+                except Exception:
+                    logger.warning("MCP server process failed its health check, restarting it")
+                    member = await self._replace(member)
+                if member is not None:
+                    self._idle.put_nowait(member)
+
+            # Refill slots left empty by failed restarts, one try per check
+            while self.missing:
+                try:
+                    member = await self._spawn()
+                except Exception:
+                    logger.warning("MCP server pool still degraded: %d of %d processes missing", self.missing, self.size)
+                    break
+                self.missing -= 1
+                self._idle.put_nowait(member)
+
+
+class PooledTool(BaseTool):
+    """Declaration of one MCP tool whose calls are served by any pool member."""
+
+    def __init__(self, pool: McpServerPool, prototype: BaseTool):
+        super().__init__(name=prototype.name, description=prototype.description)
+        self._pool = pool
+        self._prototype = prototype
+
+    def _get_declaration(self):
+        return self._prototype._get_declaration()
+
+    async def run_async(self, *, args, tool_context):
+        try:
+            return await self._pool.call(self.name, args, tool_context)
+        except PoolUnavailable as e:
+            # Reported to the model as a failed tool call, not raised out of the run
+            return {"error": str(e)}
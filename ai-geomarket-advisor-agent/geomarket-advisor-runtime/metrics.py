@@ -0,0 +1,132 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Agent runs take tens of seconds, tool and storage calls milliseconds
+RUN_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+CALL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_LATENCY = Histogram(
+    "geomarket_http_request_duration_seconds",
+    "Time until the response headers are sent, by route",
+    ["method", "route", "status"],
+    buckets=RUN_BUCKETS,
+)
+RUN_LATENCY = Histogram(
+    "geomarket_agent_run_duration_seconds", "Duration of agent runs", ["mode"], buckets=RUN_BUCKETS
+)
+RUNS_IN_FLIGHT = Gauge("geomarket_agent_runs_in_flight", "Agent runs currently executing")
+MODEL_CALLS = Counter("geomarket_model_calls_total", "LLM calls made by the agent", ["model"])
+MODEL_LATENCY = Histogram(
+    "geomarket_model_call_duration_seconds", "Duration of LLM calls", ["model"], buckets=RUN_BUCKETS
+)
+TOKENS = Counter("geomarket_model_tokens_total", "Tokens reported in ADK event usage metadata", ["kind"])
+TOOL_LATENCY = Histogram(
+    "geomarket_tool_call_duration_seconds",
+    "Duration of agent tool calls as seen by the agent, cache hits included",
+    ["tool"],
+    buckets=CALL_BUCKETS,
+)
+TOOL_ERRORS = Counter("geomarket_tool_call_errors_total", "Tool calls that returned an error result", ["tool"])
+MCP_LATENCY = Histogram(
+    "geomarket_mcp_call_duration_seconds",
+    "Duration of calls that reached a Maps MCP server process",
+    ["tool"],
+    buckets=CALL_BUCKETS,
+)
+MCP_ERRORS = Counter("geomarket_mcp_call_errors_total", "Maps MCP calls that raised", ["tool"])
+SESSION_LATENCY = Histogram(
+    "geomarket_session_store_duration_seconds", "Duration of session store operations", ["operation"],
+    buckets=CALL_BUCKETS,
+)
+
+# ADK agent callbacks. Start times are keyed by invocation (one model call
+# at a time per run) and by function call id (tools may run in parallel)
+_model_started = {}
+_tool_started = {}
+
+
+def before_model(callback_context, llm_request):
+    _model_started[callback_context.invocation_id] = (time.perf_counter(), llm_request.model or "unknown")
+
+
+def after_model(callback_context, llm_response):
+    # In streaming mode this also fires for every partial chunk
+    if llm_response.partial:
+        return
+    started = _model_started.pop(callback_context.invocation_id, None)
+    if started is None:
+        return
+    start, model = started
+    MODEL_CALLS.labels(model).inc()
+    MODEL_LATENCY.labels(model).observe(time.perf_counter() - start)
+
+
+def before_tool(tool, args, tool_context):
+    _tool_started[tool_context.function_call_id] = time.perf_counter()
+
+
+def after_tool(tool, args, tool_context, tool_response):
+    started = _tool_started.pop(tool_context.function_call_id, None)
+    if started is not None:
+        TOOL_LATENCY.labels(tool.name).observe(time.perf_counter() - started)
+    if isinstance(tool_response, dict) and (tool_response.get("isError") or "error" in tool_response):
+        TOOL_ERRORS.labels(tool.name).inc()
+
+
+def record_usage(event):
+    usage = event.usage_metadata
+    if event.partial or usage is None:
+        return
+    TOKENS.labels("prompt").inc(usage.prompt_token_count or 0)
+    TOKENS.labels("candidates").inc(usage.candidates_token_count or 0)
+    TOKENS.labels("total").inc(usage.total_token_count or 0)
+
+
+class StoreCollector:
+    """Reports the size of the persistent stores and the admission queue.
+
+    Each source is a callable returning the ``stats()`` dict of its
+    component; they are read when /metrics is scraped.
+    """
+
+    def __init__(self, session_stats, admission_stats, job_stats):
+        self.session_stats = session_stats
+        self.admission_stats = admission_stats
+        self.job_stats = job_stats
+
+    def describe(self):
+        # Nothing to check at registration; avoids querying the stores then
+        return []
+
+    def collect(self):
+        sessions = self.session_stats()
+        yield GaugeMetricFamily("geomarket_sessions", "Sessions in the session store", value=sessions["sessions"])
+        yield GaugeMetricFamily("geomarket_session_events", "Events in the session store", value=sessions["events"])
+
+        admission = self.admission_stats()
+        yield GaugeMetricFamily("geomarket_admission_running_runs", "Admitted agent runs", value=admission["running"])
+        yield GaugeMetricFamily(
+            "geomarket_admission_queued_runs", "Agent runs waiting for a slot", value=admission["queued"]
+        )
+        yield CounterMetricFamily(
+            "geomarket_admission_rejected_runs", "Agent runs rejected with 429", value=admission["rejected"]
+        )
+        yield GaugeMetricFamily(
+            "geomarket_admission_avg_wait_seconds", "Average wait for a slot", value=admission["avg_wait_seconds"]
+        )
+
+        jobs = GaugeMetricFamily("geomarket_jobs", "Jobs in the job table", labels=["status"])
+        job_stats = self.job_stats()
+        for status in ("queued", "running", "done", "failed"):
+            jobs.add_metric([status], job_stats.get(status, 0))
+        yield jobs
+
+
+def register_stores(session_stats, admission_stats, job_stats):
+    REGISTRY.register(StoreCollector(session_stats, admission_stats, job_stats))
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
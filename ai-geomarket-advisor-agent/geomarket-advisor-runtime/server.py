@@ -1,27 +1,185 @@
-from fastapi import FastAPI
-from agent import build_business_agent
+import json
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+import config
+import metrics
+from agent import build_business_agent, build_maps_pool, maps_tool_cache
+from admission import AdmissionController, Saturated
+from jobs import JobStore, JobWorkers
+from response_cache import ResponseCache, analysis_key, split_query
+from session_store import SqliteSessionService
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
 from google.adk.errors.already_exists_error import AlreadyExistsError
 from google.genai import types
 
 APP_NAME = "geomarket-advisor"
 
-app = FastAPI()
-
-agent = build_business_agent()
-session_service = InMemorySessionService()
+maps_pool = build_maps_pool()
+agent = build_business_agent(maps_pool)
+session_service = SqliteSessionService(
+    config.SESSION_DB_PATH,
+    ttl_seconds=config.SESSION_TTL_SECONDS,
+    max_events=config.SESSION_MAX_EVENTS,
+    max_sessions=config.SESSION_MAX_SESSIONS,
+)
 runner = Runner(app_name=APP_NAME, agent=agent, session_service=session_service)
+response_cache = ResponseCache(
+    config.RESPONSE_CACHE_PATH,
+    ttl_seconds=config.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+)
+admission = AdmissionController(
+    max_concurrent=config.MAX_CONCURRENT_RUNS,
+    max_per_user=config.MAX_RUNS_PER_USER,
+    max_queue=config.MAX_QUEUED_RUNS,
+    max_wait=config.MAX_QUEUE_WAIT_SECONDS,
+    retry_after=config.RETRY_AFTER_SECONDS,
+)
+# Futures of the analyses currently running, by cache key (single-flight)
+in_flight = {}
+job_store = JobStore(
+    config.JOB_DB_PATH,
+    lease_seconds=config.JOB_LEASE_SECONDS,
+    retention_seconds=config.JOB_RETENTION_SECONDS,
+)
 
-@app.post("/run")
-async def run_agent(payload: dict):
+
+@asynccontextmanager
+async def lifespan(app):
+    # Spawn and health-check the MCP servers before accepting requests
+    await maps_pool.start()
+    job_workers.start()
+    yield
+    await job_workers.close()
+    await maps_pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+metrics.register_stores(session_service.stats, admission.stats, job_store.stats)
+
+
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template so /jobs/{job_id} is one series, not one per job
+    route = request.scope.get("route")
+    metrics.HTTP_LATENCY.labels(
+        request.method, route.path if route else "unmatched", response.status_code
+    ).observe(time.perf_counter() - start)
+    return response
+
+
+async def cache_key(payload, query):
+    business_type, city = payload.get("business_type"), payload.get("city")
+    if business_type and city:
+        return analysis_key(business_type, city)
+    pair = split_query(query)
+    if not pair:
+        return None
+    # A free-form query may refer to the conversation so far ("the zones you
+    # suggested in Madrid"); it is only shared when there is no history yet
+    session_id = payload.get("session_id")
+    if session_id:
+        session = await session_service.get_session(
+            app_name=APP_NAME,
+            user_id=payload.get("user_id", "local-user"),
+            session_id=session_id,
+            config=GetSessionConfig(num_recent_events=1),
+        )
+        if session is not None and session.events:
+            return None
+    return analysis_key(*pair)
+
+
+async def analysis_events(payload, stream=False):
+    """Run one analysis and yield its progress as plain dict events.
+
+    Events are ``tool_call``, ``tool_result``, ``text`` (a partial chunk of
+    model output, only when ``stream`` is set), ``coalesced`` when an
+    identical analysis is already running and will be shared, and a closing
+    ``final`` carrying the whole answer. Raises ``Saturated`` before the first
+    event when the run is not admitted, or after ``coalesced`` when the shared
+    run was not admitted and this request is not admitted either.
+    """
     query = payload.get("query", "").strip()
     if not query:
-        return {"response": "Empty query."}
+        yield {"type": "final", "response": "Empty query.", "cached": False}
+        return
+
+    key = await cache_key(payload, query)
+    if key:
+        cached = await asyncio.to_thread(response_cache.get, key)
+        if cached is not None:
+            yield {"type": "final", "response": cached, "cached": True}
+            return
 
+    coalesced = False
+    while key and key in in_flight:
+        flight = in_flight[key]
+        if not coalesced:
+            yield {"type": "coalesced"}
+            coalesced = True
+        try:
+            response = await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            if not flight.cancelled() or asyncio.current_task().cancelling():
+                raise
+            # The leading request was abandoned or not admitted; run the
+            # analysis here (or join whoever took over) instead
+        else:
+            yield {"type": "final", "response": response, "cached": False, "coalesced": True}
+            return
+
+    future = None
+    if key and key not in in_flight:
+        future = in_flight[key] = asyncio.get_running_loop().create_future()
+    try:
+        async with admission.admit(payload.get("user_id", "local-user")):
+            async for event in agent_events(payload, query, key, stream):
+                if event["type"] == "final":
+                    final = event
+                else:
+                    yield event
+    except Saturated:
+        # A rejection belongs to this request's user and queue position:
+        # waiters go through admission themselves instead of getting a 429
+        if future:
+            future.cancel()
+        raise
+    except Exception as error:
+        if future:
+            future.set_exception(error)
+            # Nobody else may be waiting; avoid "exception never retrieved"
+            future.exception()
+        raise
+    except BaseException:
+        if future:
+            future.cancel()
+        raise
+    else:
+        if future:
+            future.set_result(final["response"])
+    finally:
+        if future:
+            del in_flight[key]
+
+    yield final
+
+
+async def agent_events(payload, query, key, stream):
     user_id = payload.get("user_id", "local-user")
-    session_id = payload.get("session_id", "local-session")
+    # Without a session id every request gets a fresh session instead of
+    # piling up in one shared history
+    session_id = payload.get("session_id") or uuid.uuid4().hex
 
     try:
         await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
@@ -31,14 +189,187 @@ async def run_agent(payload: dict):
     content = types.Content(role="user", parts=[types.Part(text=query)])
 
     final_text = None
-    async for event in runner.run_async(
-        user_id=user_id,
-        session_id=session_id,
-        new_message=content,
-    ):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                final_text = event.content.parts[0].text
+    with metrics.RUNS_IN_FLIGHT.track_inprogress(), metrics.RUN_LATENCY.labels("stream" if stream else "sync").time():
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session_id,
+            new_message=content,
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE if stream else StreamingMode.NONE),
+        ):
+            metrics.record_usage(event)
+            for call in event.get_function_calls():
+                yield {"type": "tool_call", "name": call.name, "args": call.args or {}}
+            for result in event.get_function_responses():
+                yield {"type": "tool_result", "name": result.name}
+            if event.partial:
+                # Partial chunks are followed by one aggregated event with the
+                # same text, so only the chunks are forwarded
+                for part in event.content.parts if event.content else []:
+                    if part.text:
+                        yield {"type": "text", "delta": part.text}
+            elif event.is_final_response():
+                if event.content and event.content.parts:
+                    final_text = event.content.parts[0].text
+                break
+
+    if key and final_text:
+        await asyncio.to_thread(response_cache.put, key, final_text)
+
+    yield {"type": "final", "response": final_text or "No final response captured.", "cached": False}
+
+
+def too_many_requests(error):
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+@app.post("/run")
+async def run_agent(payload: dict):
+    try:
+        async for event in analysis_events(payload):
+            if event["type"] == "final":
+                return {"response": event["response"], "cached": event["cached"]}
+    except Saturated as e:
+        raise too_many_requests(e)
+
+
+def sse_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    # Ask proxies not to buffer the stream
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events, media_type="text/event-stream", headers=headers)
+
+
+@app.post("/run/stream")
+async def run_agent_stream(payload: dict):
+    events = analysis_events(payload, stream=True)
+    # Admission is decided before the first event, while a 429 status can
+    # still be sent
+    try:
+        first = await anext(events)
+    except Saturated as e:
+        raise too_many_requests(e)
+
+    async def sse():
+        try:
+            yield sse_event(first)
+            async for event in events:
+                yield sse_event(event)
+        except Exception as e:
+            yield sse_event({"type": "error", "message": str(e)})
+
+    return sse_response(sse())
+
+
+async def analyze_pair(pair, user_id, slots):
+    # No session id: every item runs in its own fresh session
+    business_type, city = pair["business_type"], pair["city"]
+    payload = {"query": f"{business_type} in {city}", "business_type": business_type, "city": city, "user_id": user_id}
+    async with slots:
+        start = time.perf_counter()
+        while True:
+            try:
+                async for event in analysis_events(payload):
+                    if event["type"] == "final":
+                        result = {"response": event["response"], "cached": event["cached"]}
+            except Saturated as e:
+                # The batch as a whole was admitted; its items wait for a
+                # slot like jobs do instead of failing one by one
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                result = {"error": str(e)}
             break
+        result["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return {"type": "result", **pair, **result}
+
+
+@app.post("/run/batch")
+async def run_agent_batch(payload: dict):
+    items = payload.get("items") or []
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_ITEMS} items per batch.")
+
+    # Identical (business type, city) pairs are analyzed once and reported
+    # under every index they appeared at
+    pairs = {}
+    for index, item in enumerate(items):
+        business_type, city = (item.get("business_type") or "").strip(), (item.get("city") or "").strip()
+        if not business_type or not city:
+            raise HTTPException(status_code=400, detail=f"Item {index} needs business_type and city.")
+        key = analysis_key(business_type, city)
+        pairs.setdefault(key, {"business_type": business_type, "city": city, "indexes": []})["indexes"].append(index)
+
+    # All items run as the same user, so more than MAX_RUNS_PER_USER at a
+    # time would only be rejected
+    limit = min(config.BATCH_CONCURRENCY, config.MAX_RUNS_PER_USER)
+    concurrency = min(int(payload.get("concurrency") or limit), limit)
+    slots = asyncio.Semaphore(max(concurrency, 1))
+    user_id = payload.get("user_id", "local-user")
+
+    async def sse():
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(analyze_pair(pair, user_id, slots)) for pair in pairs.values()]
+        yield sse_event({"type": "start", "items": len(items), "unique": len(pairs), "concurrency": concurrency})
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield sse_event(await done)
+            yield sse_event({"type": "done", "elapsed_seconds": round(time.perf_counter() - start, 3)})
+        finally:
+            # The client went away: stop the analyses nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return sse_response(sse())
+
+
+async def run_job(payload):
+    # Jobs wait for admission instead of failing: the client is not holding
+    # a connection open, so there is nobody to send a 429 to
+    while True:
+        try:
+            async for event in analysis_events(payload):
+                if event["type"] == "final":
+                    return {"response": event["response"], "cached": event["cached"]}
+        except Saturated as e:
+            await asyncio.sleep(e.retry_after)
+
+
+job_workers = JobWorkers(job_store, run_job, workers=config.JOB_WORKERS)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(payload: dict):
+    if not payload.get("query", "").strip():
+        raise HTTPException(status_code=400, detail="Empty query.")
+    job_id = await job_workers.submit(payload)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    job = await job_workers.wait(job_id, min(max(wait, 0), config.JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job.")
+    return job
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # Scraping reads the SQLite stores, so keep it off the event loop
+    body, content_type = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type=content_type)
+
 
-    return {"response": final_text or "No final response captured."}
+@app.get("/stats")
+async def stats():
+    return {
+        "response_cache": await asyncio.to_thread(response_cache.stats),
+        "mcp_cache": maps_tool_cache.stats(),
+        "mcp_pool": maps_pool.stats(),
+        "sessions": await asyncio.to_thread(session_service.stats),
+        "admission": {**admission.stats(), "coalescing": len(in_flight)},
+        "jobs": await asyncio.to_thread(job_store.stats),
+    }
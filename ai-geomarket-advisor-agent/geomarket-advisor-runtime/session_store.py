@@ -0,0 +1,231 @@
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+
+from metrics import SESSION_LATENCY
+
+
+class SqliteSessionService(BaseSessionService):
+    """ADK session service backed by a SQLite file, with bounded growth.
+
+    - Sessions idle for longer than ``ttl_seconds`` expire.
+    - Each session keeps at most ``max_events`` events. Older history is
+      dropped a whole turn at a time, so the stored history always starts
+      at a user message and never separates a tool call from its response.
+    - Beyond ``max_sessions`` the least recently updated sessions are evicted.
+
+    Being a file, it survives restarts and is shared by every uvicorn worker.
+    """
+
+    def __init__(self, path, ttl_seconds, max_events, max_sessions):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_events = max_events
+        self.max_sessions = max_sessions
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    last_update_time REAL NOT NULL,
+                    PRIMARY KEY (app_name, user_id, id)
+                )
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    app_name TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    is_user INTEGER NOT NULL,
+                    timestamp REAL NOT NULL,
+                    event TEXT NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_lru ON sessions (last_update_time)")
+            connection.execute("CREATE INDEX IF NOT EXISTS events_session ON events (app_name, user_id, session_id, seq)")
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        with SESSION_LATENCY.labels("create_session").time():
+            return await asyncio.to_thread(self._create, app_name, user_id, state or {}, session_id or uuid.uuid4().hex)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        with SESSION_LATENCY.labels("get_session").time():
+            return await asyncio.to_thread(self._get, app_name, user_id, session_id, config)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        return await asyncio.to_thread(self._list, app_name, user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, app_name, user_id, session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if not event.partial:
+            with SESSION_LATENCY.labels("append_event").time():
+                await asyncio.to_thread(self._append, session, event)
+        return event
+
+    def stats(self):
+        with self._connect() as connection:
+            (sessions,) = connection.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            (events,) = connection.execute("SELECT COUNT(*) FROM events").fetchone()
+        return {"sessions": sessions, "events": events}
+
+    def _create(self, app_name, user_id, state, session_id):
+        now = time.time()
+        with self._connect() as connection:
+            self._expire(connection, now)
+            # Check and insert in one statement: two concurrent creates of the
+            # same id (other threads or workers) can't both get past a SELECT
+            inserted = connection.execute(
+                "INSERT OR IGNORE INTO sessions (app_name, user_id, id, state, last_update_time) VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, json.dumps(state), now),
+            ).rowcount
+            if not inserted:
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+            evicted = connection.execute(
+                "SELECT app_name, user_id, id FROM sessions ORDER BY last_update_time DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,),
+            ).fetchall()
+            for key in evicted:
+                self._delete_rows(connection, *key)
+        return Session(app_name=app_name, user_id=user_id, id=session_id, state=state, last_update_time=now)
+
+    def _get(self, app_name, user_id, session_id, config):
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                self._delete_rows(connection, app_name, user_id, session_id)
+                return None
+
+            query = "SELECT event FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            params = [app_name, user_id, session_id]
+            if config and config.after_timestamp:
+                query += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            query += " ORDER BY seq DESC"
+            if config and config.num_recent_events:
+                query += " LIMIT ?"
+                params.append(config.num_recent_events)
+            events = [Event.model_validate_json(event) for (event,) in connection.execute(query, params)]
+
+        events.reverse()
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(row[0]),
+            events=events,
+            last_update_time=row[1],
+        )
+
+    def _list(self, app_name, user_id):
+        query = "SELECT user_id, id, state, last_update_time FROM sessions WHERE app_name = ? AND last_update_time >= ?"
+        params = [app_name, time.time() - self.ttl_seconds]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._connect() as connection:
+            rows = connection.execute(query, params).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=row[0], id=row[1], state=json.loads(row[2]), last_update_time=row[3])
+            for row in rows
+        ])
+
+    def _delete(self, app_name, user_id, session_id):
+        with self._connect() as connection:
+            self._delete_rows(connection, app_name, user_id, session_id)
+
+    def _append(self, session, event):
+        key = (session.app_name, session.user_id, session.id)
+        with self._connect() as connection:
+            updated = connection.execute(
+                "UPDATE sessions SET state = ?, last_update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                (json.dumps(session.state), event.timestamp, *key),
+            )
+            if not updated.rowcount:
+                # Evicted or expired while the run was in progress
+                return
+            connection.execute(
+                "INSERT INTO events (app_name, user_id, session_id, is_user, timestamp, event) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, event.author == "user", event.timestamp, event.model_dump_json(exclude_none=True)),
+            )
+            self._truncate(connection, *key)
+
+    def _truncate(self, connection, app_name, user_id, session_id):
+        rows = connection.execute(
+            "SELECT seq, is_user FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq",
+            (app_name, user_id, session_id),
+        ).fetchall()
+        if len(rows) <= self.max_events:
+            return
+        # Keep from the oldest turn start that fits; the current turn is
+        # always kept, even when it alone exceeds the cap
+        turn_starts = [index for index, (_, is_user) in enumerate(rows) if is_user]
+        fitting = [index for index in turn_starts if len(rows) - index <= self.max_events]
+        keep_from = fitting[0] if fitting else (turn_starts[-1] if turn_starts else 0)
+        if keep_from:
+            connection.execute(
+                "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? AND seq < ?",
+                (app_name, user_id, session_id, rows[keep_from][0]),
+            )
+
+    def _expire(self, connection, now):
+        expired = connection.execute(
+            "SELECT app_name, user_id, id FROM sessions WHERE last_update_time < ?",
+            (now - self.ttl_seconds,),
+        ).fetchall()
+        for key in expired:
+            self._delete_rows(connection, *key)
+
+    @staticmethod
+    def _delete_rows(connection, app_name, user_id, session_id):
+        connection.execute(
+            "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (app_name, user_id, session_id),
+        )
+        connection.execute(
+            "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+            (app_name, user_id, session_id),
+        )
@@ -1,52 +1,212 @@
 import streamlit as st
 import requests
+import json
+import time
 import uuid
 import os
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000").rstrip("/")
 
+
+def sse_events(resp):
+    # Minimal Server-Sent Events parser: one JSON "data:" line per event
+    for line in resp.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield json.loads(line[len("data:"):])
+
+
+def poll_job(job_id, progress):
+    # Long-poll: each GET returns as soon as the job finishes, or after
+    # `wait` seconds with the job still running
+    start = time.monotonic()
+    while True:
+        resp = requests.get(f"{BACKEND_URL}/jobs/{job_id}", params={"wait": 20}, timeout=(10, 40))
+        resp.raise_for_status()
+        job = resp.json()
+        if job["status"] in ("done", "failed"):
+            return job
+        progress.update(label=f"Analysis {job['status']}... {time.monotonic() - start:.0f} s")
+
+
+def show_job(job, progress, result):
+    if job["status"] == "done":
+        progress.update(label="Analysis complete", state="complete")
+        if job.get("cached"):
+            st.caption("Served from cache")
+        result.markdown(job["response"])
+    else:
+        progress.update(label="Analysis failed", state="error")
+        st.error(job.get("error", "Unknown error"))
+
+
+def parse_cities(text):
+    # One city per line or comma separated
+    return [city.strip() for city in text.replace("\n", ",").split(",") if city.strip()]
+
+
 st.set_page_config(page_title="GeoMarket Advisor", layout="centered")
 
+# One backend session per browser session, so histories are never shared
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.user_id = f"browser-{uuid.uuid4().hex[:12]}"
+
 st.title("GeoMarket Advisor")
 st.caption("AI-powered business location analysis")
 
+mode = st.radio("Mode", ["Single city", "Compare cities"], horizontal=True)
+
 business_type = st.text_input(
     "Business type",
     placeholder="e.g. Bakery, Coffee shop, Gym"
 )
 
-city = st.text_input(
-    "City",
-    placeholder="e.g. Málaga, Madrid, Barcelona"
-)
+if mode == "Single city":
+    city = st.text_input(
+        "City",
+        placeholder="e.g. Málaga, Madrid, Barcelona"
+    )
+    background = st.toggle(
+        "Run as background job",
+        help="Submit the analysis as a job and poll for the result instead of keeping a stream open"
+    )
+else:
+    cities = parse_cities(st.text_area(
+        "Cities",
+        placeholder="One per line or comma separated, e.g. Málaga, Madrid, Barcelona"
+    ))
 
 analyze = st.button("Analyze")
 
-if analyze and business_type and city:
+if analyze and mode == "Compare cities" and business_type and cities:
+    payload = {
+        "items": [{"business_type": business_type, "city": city} for city in cities],
+        "user_id": st.session_state.user_id
+    }
+
+    resp = requests.post(
+        f"{BACKEND_URL}/run/batch",
+        json=payload,
+        stream=True,
+        timeout=(10, 300)
+    )
+
+    st.write("STATUS:", resp.status_code)
+
+    if resp.status_code == 200:
+        st.markdown("### Comparison")
+        progress = st.progress(0.0, text="Starting...")
+        summary = st.empty()
+        rows = []
+        try:
+            for event in sse_events(resp):
+                if event["type"] == "start":
+                    total = event["unique"]
+                elif event["type"] == "result":
+                    rows.append({
+                        "City": event["city"],
+                        "Seconds": event["elapsed_seconds"],
+                        "Cached": event.get("cached", False),
+                        "Status": "error" if "error" in event else "ok"
+                    })
+                    progress.progress(len(rows) / total, text=f"{len(rows)} of {total} cities analyzed")
+                    summary.dataframe(rows, use_container_width=True)
+                    with st.expander(f"{event['city']} ({event['elapsed_seconds']} s)"):
+                        if "error" in event:
+                            st.error(event["error"])
+                        else:
+                            st.markdown(event["response"])
+                elif event["type"] == "done":
+                    progress.progress(1.0, text=f"Done in {event['elapsed_seconds']} s")
+        except (requests.RequestException, ValueError) as e:
+            st.error(f"Invalid response from backend: {e}")
+    else:
+        st.error("Backend error")
+        st.text(resp.text)
+
+elif analyze and mode == "Single city" and business_type and city and background:
+    payload = {
+        "query": f"{business_type} in {city}",
+        "business_type": business_type,
+        "city": city,
+        "user_id": st.session_state.user_id,
+        "session_id": st.session_state.session_id
+    }
+
+    resp = requests.post(f"{BACKEND_URL}/jobs", json=payload, timeout=10)
+
+    st.write("STATUS:", resp.status_code)
+
+    if resp.status_code == 202:
+        # Remembered so that a rerun of the page picks the same job up again
+        st.session_state.job_id = resp.json()["job_id"]
+    else:
+        st.error("Backend error")
+        st.text(resp.text)
+
+elif analyze and mode == "Single city" and business_type and city:
     query = f"{business_type} in {city}"
 
     payload = {
-        "query": query
+        "query": query,
+        "business_type": business_type,
+        "city": city,
+        "user_id": st.session_state.user_id,
+        "session_id": st.session_state.session_id
     }
 
+    # Only the gap between two events is bounded, so long analyses that keep
+    # streaming progress never hit the timeout
     resp = requests.post(
-        f"{BACKEND_URL}/run",
+        f"{BACKEND_URL}/run/stream",
         json=payload,
-        timeout=120
+        stream=True,
+        timeout=(10, 120)
     )
 
     st.write("STATUS:", resp.status_code)
 
     if resp.status_code == 200:
+        st.markdown("### Result")
+        progress = st.status("Analyzing...", expanded=False)
+        result = st.empty()
+        chunks = []
         try:
-            st.markdown("### Result")
-            st.write(resp.json()["response"])
-        except Exception:
-            st.error("Invalid response from backend")
-            st.text(resp.text)
+            for event in sse_events(resp):
+                if event["type"] == "tool_call":
+                    progress.write(f"Calling `{event['name']}`")
+                elif event["type"] == "coalesced":
+                    progress.write("Joined an identical analysis already in progress")
+                elif event["type"] == "text":
+                    chunks.append(event["delta"])
+                    result.markdown("".join(chunks))
+                elif event["type"] == "final":
+                    progress.update(label="Analysis complete", state="complete")
+                    if event.get("cached"):
+                        st.caption("Served from cache")
+                    result.markdown(event["response"])
+                elif event["type"] == "error":
+                    progress.update(label="Analysis failed", state="error")
+                    st.error(event["message"])
+        except (requests.RequestException, ValueError) as e:
+            progress.update(label="Analysis failed", state="error")
+            st.error(f"Invalid response from backend: {e}")
+    elif resp.status_code == 429:
+        st.warning(f"The server is busy. Try again in {resp.headers.get('Retry-After', 'a few')} seconds.")
     else:
         st.error("Backend error")
         st.text(resp.text)
 
 elif analyze:
     st.warning("Please fill in both fields.")
+
+if mode == "Single city" and st.session_state.get("job_id"):
+    st.markdown("### Result")
+    progress = st.status("Analysis queued...", expanded=False)
+    result = st.empty()
+    try:
+        job = poll_job(st.session_state.job_id, progress)
+    except (requests.RequestException, ValueError) as e:
+        job = {"status": "failed", "error": f"Invalid response from backend: {e}"}
+    del st.session_state.job_id
+    show_job(job, progress, result)